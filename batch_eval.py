@@ -0,0 +1,171 @@
+import numpy as np
+
+import weights
+
+# ===================================================================================
+# Batched game_heuristic
+# ===================================================================================
+# Evaluates N positions in one call, term by term the same as BotAi.game_heuristic.
+# A position is either an 8x8 int8 board (+1 own disc, -1 opponent disc, 0 empty)
+# or a pair of uint64 masks (own, opponent) with square (i, j) on bit i * 8 + j.
+# The score is from the point of view of the "own" side.
+
+FULL = np.uint64(0xFFFFFFFFFFFFFFFF)
+NOT_COL_0 = np.uint64(0xFFFFFFFFFFFFFFFF ^ 0x0101010101010101)
+NOT_COL_7 = np.uint64(0xFFFFFFFFFFFFFFFF ^ 0x8080808080808080)
+SHIFTS = [(x * 8 + y, NOT_COL_0 if y == 1 else NOT_COL_7 if y == -1 else FULL)
+          for x, y in [(-1, -1), (-1, 0), (0, -1), (1, -1), (-1, 1), (0, 1), (1, 0), (1, 1)]]
+
+# the same weights file as bot_canary, so both score a position alike
+WEIGHTS = weights.load()
+TERM_WEIGHTS = tuple(WEIGHTS[term] for term in weights.TERMS)
+
+
+def value_masks(table):
+    """(value, mask of the squares holding it) for every distinct value of an 8x8 table."""
+    masks = {}
+    for i in range(8):
+        for j in range(8):
+            masks[table[i][j]] = masks.get(table[i][j], 0) | (1 << (i * 8 + j))
+    return [(value, np.uint64(mask)) for value, mask in masks.items()]
+
+
+V_MASKS = value_masks(WEIGHTS["V"])
+
+CORNER_MASK = np.uint64((1 << 0) | (1 << 7) | (1 << 56) | (1 << 63))
+
+# corner square with its three neighbours, as (corner bit, neighbours mask)
+CORNER_REGIONS = [
+    (np.uint64(1 << 0), np.uint64((1 << 1) | (1 << 9) | (1 << 8))),
+    (np.uint64(1 << 7), np.uint64((1 << 6) | (1 << 14) | (1 << 15))),
+    (np.uint64(1 << 56), np.uint64((1 << 57) | (1 << 49) | (1 << 48))),
+    (np.uint64(1 << 63), np.uint64((1 << 55) | (1 << 54) | (1 << 62))),
+]
+# regions the original heuristic actually counted, see LEGACY_CORNER_REGIONS in bot_canary
+LEGACY_CORNER_REGIONS = [CORNER_REGIONS[0], CORNER_REGIONS[3]]
+
+_BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+def popcount(masks):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(masks).astype(np.int64)
+    return _BYTE_COUNTS[masks.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+def _shift(masks, step, guard):
+    if step > 0:
+        return (masks << np.uint64(step)) & guard
+    return (masks >> np.uint64(-step)) & guard
+
+
+def to_masks(positions):
+    """(N, 8, 8) int8 boards or (N, 2) uint64 masks -> own and opponent uint64 arrays."""
+    positions = np.asarray(positions)
+    if positions.ndim == 2 and positions.shape[1] == 2:
+        masks = positions.astype(np.uint64, copy=False)
+        return masks[:, 0], masks[:, 1]
+    cells = positions.reshape(-1, 64)
+    own = np.packbits(cells == 1, axis=1, bitorder="little").view("<u8")[:, 0]
+    opp = np.packbits(cells == -1, axis=1, bitorder="little").view("<u8")[:, 0]
+    return own.astype(np.uint64), opp.astype(np.uint64)
+
+
+def to_bits(masks):
+    """uint64 masks -> (N, 64) uint8 array of single squares."""
+    return np.unpackbits(masks.astype("<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+
+
+def move_lines(own, opp):
+    """Batched bitboard.move_lines: legal (square, direction) pairs of the own side."""
+    empty = ~(own | opp)
+    result = np.zeros(own.shape, dtype=np.int64)
+    for step, guard in SHIFTS:
+        inner = opp & guard
+        x = _shift(own, step, guard) & inner
+        for _ in range(5):
+            x |= _shift(x, step, guard) & inner
+        result += popcount(_shift(x, step, guard) & empty)
+    return result
+
+
+def moves(own, opp):
+    """Batched bitboard.moves: mask of the squares the own side can play."""
+    empty = ~(own | opp)
+    result = np.zeros(own.shape, dtype=np.uint64)
+    for step, guard in SHIFTS:
+        inner = opp & guard
+        x = _shift(own, step, guard) & inner
+        for _ in range(5):
+            x |= _shift(x, step, guard) & inner
+        result |= _shift(x, step, guard) & empty
+    return result
+
+
+def flips(own, opp, move):
+    """Batched bitboard.flips: opponent discs turned by an own disc placed on the move bit."""
+    result = np.zeros(own.shape, dtype=np.uint64)
+    for step, guard in SHIFTS:
+        line = _shift(move, step, guard) & opp
+        for _ in range(5):
+            line |= _shift(line, step, guard) & opp
+        closed = (_shift(line, step, guard) & own) != 0
+        result |= np.where(closed, line, np.uint64(0))
+    return result
+
+
+def frontier(own, opp):
+    """Number of own and opponent discs next to an empty square."""
+    empty = ~(own | opp)
+    near_empty = np.zeros(own.shape, dtype=np.uint64)
+    for step, guard in SHIFTS:
+        near_empty |= _shift(empty, step, guard)
+    return popcount(own & near_empty), popcount(opp & near_empty)
+
+
+def _ratio(mine, theirs):
+    # the (100 * larger) / total shape shared by the disc, frontier and mobility terms
+    total = np.maximum(mine + theirs, 1)
+    return np.where(mine > theirs, (100.0 * mine) / total,
+                    np.where(mine < theirs, -(100.0 * theirs) / total, 0.0))
+
+
+def features(positions, fix_frontier=False, fix_corner_closeness=False, value_masks=None):
+    """(N, 6) float64 array of the game_heuristic terms p, c, l, m, f, d before weighting."""
+    own, opp = to_masks(positions)
+
+    p = _ratio(popcount(own), popcount(opp))
+
+    if fix_frontier:
+        my_front, opp_front = frontier(own, opp)
+        f = -_ratio(my_front, opp_front)
+    else:
+        f = np.zeros(own.shape)
+
+    c = 25 * (popcount(own & CORNER_MASK) - popcount(opp & CORNER_MASK))
+
+    closeness = np.zeros(own.shape, dtype=np.int64)
+    for corner, adjacent in CORNER_REGIONS if fix_corner_closeness else LEGACY_CORNER_REGIONS:
+        corner_empty = ((own | opp) & corner) == 0
+        closeness += np.where(corner_empty, popcount(own & adjacent) - popcount(opp & adjacent), 0)
+    l = -12.5 * closeness
+
+    # a side without moves is credited with its opponent's moves, as in game_heuristic
+    my_moves = move_lines(own, opp)
+    opp_moves = move_lines(opp, own)
+    my_moves, opp_moves = np.where(my_moves == 0, opp_moves, my_moves), np.where(opp_moves == 0, my_moves, opp_moves)
+    m = _ratio(my_moves, opp_moves)
+
+    d = np.zeros(own.shape, dtype=np.int64)
+    for value, mask in V_MASKS if value_masks is None else value_masks:
+        d = d + value * (popcount(own & mask) - popcount(opp & mask))
+
+    return np.stack([p, c, l, m, f, d], axis=1).astype(np.float64)
+
+
+def evaluate(positions, fix_frontier=False, fix_corner_closeness=False):
+    """game_heuristic for every position, returned as a float64 array of length N."""
+    p, c, l, m, f, d = features(positions, fix_frontier, fix_corner_closeness).T
+    wp, wc, wl, wm, wf, wd = TERM_WEIGHTS
+    return (wp * p) + (wc * c) + (wl * l) + \
+           (wm * m) + (wf * f) + (wd * d)
@@ -0,0 +1,278 @@
+from color import Color
+from copy import deepcopy
+from game import session
+import argparse
+import bitboard
+import bot_canary
+import botworker
+import json
+import math
+import os
+import protocol as events
+import random
+import rules
+import sys
+import time
+import types
+
+"""
+Число листьев дерева ходов от начальной позиции (пропуск хода не уменьшает глубину,
+законченная партия считается одним листом)
+"""
+PERFT = {1: 4, 2: 12, 3: 56, 4: 244, 5: 1396, 6: 8200, 7: 55092, 8: 390216}
+
+# Для каждой метрики: True, если больше - лучше
+HIGHER_IS_BETTER = {
+    "perft nodes/sec": True,
+    "minimax nodes/sec": True,
+    "bot_turn p50": False,
+    "bot_turn p95": False,
+    "bot_turn p99": False,
+    "bot_turn max": False,
+    "session games/sec": True,
+    "mcts playouts/sec": True,
+    "bot process ping p50": False,
+}
+
+
+def other(color: Color) -> Color:
+    return Color.WHITE if color is Color.BLACK else Color.BLACK
+
+
+"""
+perft по rules.available_fields / rules.redraw на доске из списков
+"""
+
+
+def perft_rules(board: list[list[Color]], color: Color, depth: int) -> int:
+    if depth == 0:
+        return 1
+    fields = rules.available_fields(board, color)
+    if len(fields) == 0:
+        if len(rules.available_fields(board, other(color))) == 0:
+            return 1
+        return perft_rules(board, other(color), depth)
+    total = 0
+    for field in fields:
+        child = deepcopy(board)
+        child[field[0]][field[1]] = color
+        rules.redraw(child, field, color, {"details": []})
+        total += perft_rules(child, other(color), depth - 1)
+    return total
+
+
+"""
+perft по Game.available_moves / Game.play бота (пропуски Game.play делает сам)
+"""
+
+
+def perft_game(game: bot_canary.Game, depth: int) -> int:
+    if depth == 0 or game.is_game_over():
+        return 1
+    total = 0
+    for move in dict.fromkeys(game.available_moves()):
+        record = game.play(move, validate=False)
+        total += perft_game(game, depth - 1)
+        game.undo(record)
+    return total
+
+
+"""
+perft по битовым маскам
+"""
+
+
+def perft_bitboard(own: int, opp: int, depth: int) -> int:
+    if depth == 0:
+        return 1
+    moves = bitboard.moves(own, opp)
+    if not moves:
+        if not bitboard.moves(opp, own):
+            return 1
+        return perft_bitboard(opp, own, depth)
+    total = 0
+    for square in bitboard.squares(moves):
+        own_after, opp_after = bitboard.play(own, opp, square)
+        total += perft_bitboard(opp_after, own_after, depth - 1)
+    return total
+
+
+"""
+Сверяет три реализации правил между собой и с известными значениями
+"""
+
+
+def bench_perft(depth: int) -> dict:
+    board = bitboard.to_board(bitboard.START_BLACK, bitboard.START_WHITE)
+    started = time.perf_counter()
+    by_rules = perft_rules(board, Color.BLACK, depth)
+    elapsed = time.perf_counter() - started
+    by_game = perft_game(bot_canary.Game(), depth)
+    by_bitboard = perft_bitboard(bitboard.START_BLACK, bitboard.START_WHITE, depth)
+    if not by_rules == by_game == by_bitboard == PERFT.get(depth, by_rules):
+        raise AssertionError(f"perft({depth}): rules {by_rules}, Game {by_game}, bitboard {by_bitboard}, "
+                             f"ожидалось {PERFT.get(depth)}")
+    return {"perft depth": depth, "perft nodes": by_rules, "perft nodes/sec": by_rules / elapsed}
+
+
+"""
+Позиции для замеров: случайные партии, остановленные после plies ходов
+"""
+
+
+def sample_positions(count: int, seed: int) -> list[bot_canary.Game]:
+    rng = random.Random(seed)
+    result = []
+    while len(result) < count:
+        game = bot_canary.Game()
+        for _ in range(rng.randint(4, 40)):
+            if game.is_game_over():
+                break
+            game.play(rng.choice(game.available_moves()))
+        if not game.is_game_over():
+            result.append(game)
+    return result
+
+
+def bench_minimax(positions: list[bot_canary.Game], depth: int) -> dict:
+    nodes = 0
+    elapsed = 0.0
+    for game in positions:
+        bot_canary.BotAi.table.clear()
+        state = bot_canary.SearchState(math.inf)
+        bot_canary.BotAi.minimax(game, depth, -math.inf, math.inf, game.current_player, state)
+        state.finish()
+        nodes += state.nodes
+        elapsed += state.elapsed
+    return {"minimax depth": depth, "minimax nodes": nodes, "minimax nodes/sec": nodes / elapsed}
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def bench_bot_turn(positions: list[bot_canary.Game], time_budget: float) -> dict:
+    bot_canary.BotAi.TIME_BUDGET = time_budget
+    latencies = []
+    for game in positions:
+        board = bot_canary.FormatConverter.game_to_ai_board(game.board)
+        started = time.perf_counter()
+        bot_canary.bot_turn(board, game.current_player)
+        latencies.append(time.perf_counter() - started)
+    return {
+        "bot_turn budget": time_budget,
+        "bot_turn p50": percentile(latencies, 0.50),
+        "bot_turn p95": percentile(latencies, 0.95),
+        "bot_turn p99": percentile(latencies, 0.99),
+        "bot_turn max": max(latencies),
+    }
+
+
+"""
+MCTS с новым деревом в каждой позиции: скорость плейаутов и объем дерева
+"""
+
+
+def bench_mcts(positions: list[bot_canary.Game], time_budget: float) -> dict:
+    playouts = 0
+    elapsed = 0.0
+    largest = 0
+    for game in positions:
+        tree = bot_canary.MonteCarloTree(bot_canary.BotAi.MCTS_NODES, bot_canary.BotAi.MCTS_EXPLORATION)
+        own, opp = bitboard.split(game.black_mask, game.white_mask, game.current_player)
+        tree.search(own, opp, time_budget)
+        playouts += tree.playouts
+        elapsed += tree.elapsed
+        largest = max(largest, tree.memory_bytes())
+    return {"mcts playouts/sec": playouts / elapsed, "mcts tree bytes max": largest}
+
+
+"""
+Партии через game.session между двумя случайными ботами: меряется сам судья
+"""
+
+
+def bench_session(games: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    bot = types.ModuleType("bench_random")
+    bot.bot_turn = lambda board, color: rng.choice(rules.available_fields(board, color))
+    started = time.perf_counter()
+    for _ in range(games):
+        session(bitboard.to_board(bitboard.START_BLACK, bitboard.START_WHITE), bot, bot, events.NullSink())
+    return {"session games": games, "session games/sec": games / (time.perf_counter() - started)}
+
+
+"""
+Запросы к боту в отдельном процессе (botworker) без работы бота: обмен через разделяемую
+память и семафоры туда и обратно
+"""
+
+
+def bench_bot_process(calls: int) -> dict:
+    host = botworker.BotProcess("bot_canary")
+    try:
+        pings = [host.ping() for _ in range(calls)]
+    finally:
+        host.close()
+    return {"bot process ping p50": percentile(pings, 0.50)}
+
+
+"""
+Метрики, ухудшившиеся относительно базовых больше чем на threshold (доля)
+"""
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    found = []
+    for metric, higher_is_better in HIGHER_IS_BETTER.items():
+        if metric not in results or metric not in baseline or not baseline[metric]:
+            continue
+        change = (results[metric] - baseline[metric]) / baseline[metric]
+        if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+            found.append(f"{metric}: {baseline[metric]:.6g} -> {results[metric]:.6g} ({change:+.1%})")
+    return found
+
+
+def run(args) -> dict:
+    positions = sample_positions(args.positions, args.seed)
+    results = {}
+    results.update(bench_perft(args.perft_depth))
+    results.update(bench_minimax(positions, args.minimax_depth))
+    results.update(bench_bot_turn(positions, args.time_budget))
+    results.update(bench_mcts(positions, args.time_budget))
+    results.update(bench_session(args.games, args.seed))
+    results.update(bench_bot_process(args.pings))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры скорости правил, судьи и бота")
+    parser.add_argument("--perft-depth", type=int, default=5)
+    parser.add_argument("--minimax-depth", type=int, default=3)
+    parser.add_argument("--positions", type=int, default=20, help="позиций для minimax и bot_turn")
+    parser.add_argument("--time-budget", type=float, default=0.1, help="секунд на ход в замере bot_turn")
+    parser.add_argument("--games", type=int, default=50, help="партий в замере session")
+    parser.add_argument("--pings", type=int, default=2000, help="запросов в замере процесса бота")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="куда записать результаты в JSON")
+    parser.add_argument("--baseline", default="bench_baseline.json", help="базовые результаты для сравнения")
+    parser.add_argument("--save-baseline", action="store_true", help="сохранить результаты как базовые")
+    parser.add_argument("--threshold", type=float, default=0.10, help="допустимое ухудшение, доля")
+    args = parser.parse_args()
+
+    results = run(args)
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            file.write(text + "\n")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            found = regressions(results, json.load(file), args.threshold)
+        for line in found:
+            print("Регрессия:", line)
+        sys.exit(1 if found else 0)
@@ -0,0 +1,299 @@
+from color import Color
+
+"""
+Битовое представление позиции: два 64-битных числа, по одному на цвет.
+Поле (i, j) соответствует биту i * 8 + j
+"""
+
+FULL = 0xFFFFFFFFFFFFFFFF
+NOT_COL_0 = FULL ^ 0x0101010101010101
+NOT_COL_7 = FULL ^ 0x8080808080808080
+
+DIRECTIONS = [(-1, -1), (-1, 0), (0, -1), (1, -1), (-1, 1), (0, 1), (1, 0), (1, 1)]
+
+# Сдвиг и маска для каждого направления: маска отсекает переход через край доски
+SHIFTS = [(di * 8 + dj, NOT_COL_0 if dj == 1 else NOT_COL_7 if dj == -1 else FULL) for di, dj in DIRECTIONS]
+
+START_BLACK = (1 << 28) | (1 << 35)
+START_WHITE = (1 << 27) | (1 << 36)
+
+
+"""
+Сдвигает маску на одно поле в заданном направлении
+"""
+
+
+def shift(mask: int, step: int, guard: int) -> int:
+    if step > 0:
+        return (mask << step) & guard
+    return (mask >> -step) & guard
+
+
+"""
+Номер бита для координаты поля
+"""
+
+
+def square(field: tuple[int, int]) -> int:
+    return field[0] * 8 + field[1]
+
+
+"""
+Возвращает координаты полей, отмеченных в маске, в порядке возрастания номера бита
+"""
+
+
+def fields(mask: int) -> list[tuple[int, int]]:
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(divmod(low.bit_length() - 1, 8))
+        mask ^= low
+    return result
+
+
+"""
+Номера битов, отмеченных в маске, в порядке возрастания
+"""
+
+
+def squares(mask: int) -> list[int]:
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(low.bit_length() - 1)
+        mask ^= low
+    return result
+
+
+"""
+Переводит доску в пару битовых масок (черные, белые)
+"""
+
+
+def from_board(board: list[list[Color]]) -> tuple[int, int]:
+    # Обращение к членам Color дорогое, поэтому они берутся в локальные переменные один раз
+    black_color, white_color = Color.BLACK, Color.WHITE
+    black = white = 0
+    bit = 1
+    for row in board:
+        for cell in row:
+            if cell is black_color:
+                black |= bit
+            elif cell is white_color:
+                white |= bit
+            bit <<= 1
+    return black, white
+
+
+# Строки доски по паре байтов масок (черные << 8 | белые), заполняются по мере надобности
+ROWS = {}
+
+
+"""
+Переводит пару битовых масок обратно в доску
+"""
+
+
+def to_board(black: int, white: int) -> list[list[Color]]:
+    board = []
+    for shift in range(0, 64, 8):
+        key = (black >> shift & 0xFF) << 8 | white >> shift & 0xFF
+        row = ROWS.get(key)
+        if row is None:
+            row = ROWS[key] = tuple(Color.BLACK if black >> k & 1 else Color.WHITE if white >> k & 1 else Color.EMPTY
+                                    for k in range(shift, shift + 8))
+        board.append(list(row))
+    return board
+
+
+"""
+Маски (своих, чужих) фишек для выбранного цвета
+"""
+
+
+def split(black: int, white: int, current_color: Color) -> tuple[int, int]:
+    return (black, white) if current_color is Color.BLACK else (white, black)
+
+
+"""
+Маска полей, куда может пойти владелец own
+"""
+
+
+def moves(own: int, opp: int) -> int:
+    empty = FULL & ~(own | opp)
+    result = 0
+    for step, guard in SHIFTS:
+        inner = guard & opp
+        if step > 0:
+            x = (own << step) & inner
+            x |= (x << step) & inner
+            x |= (x << step) & inner
+            x |= (x << step) & inner
+            x |= (x << step) & inner
+            x |= (x << step) & inner
+            result |= (x << step) & guard & empty
+        else:
+            step = -step
+            x = (own >> step) & inner
+            x |= (x >> step) & inner
+            x |= (x >> step) & inner
+            x |= (x >> step) & inner
+            x |= (x >> step) & inner
+            x |= (x >> step) & inner
+            result |= (x >> step) & guard & empty
+    return result
+
+
+"""
+Число пар (поле, направление), по которым владелец own может сделать ход:
+столько же раз поле попадало в старый список available_fields с повторами
+"""
+
+
+def move_lines(own: int, opp: int) -> int:
+    empty = FULL & ~(own | opp)
+    result = 0
+    for step, guard in SHIFTS:
+        inner = guard & opp
+        if step > 0:
+            x = (own << step) & inner
+            x |= (x << step) & inner
+            x |= (x << step) & inner
+            x |= (x << step) & inner
+            x |= (x << step) & inner
+            x |= (x << step) & inner
+            result += ((x << step) & guard & empty).bit_count()
+        else:
+            step = -step
+            x = (own >> step) & inner
+            x |= (x >> step) & inner
+            x |= (x >> step) & inner
+            x |= (x >> step) & inner
+            x |= (x >> step) & inner
+            x |= (x >> step) & inner
+            result += ((x >> step) & guard & empty).bit_count()
+    return result
+
+
+"""
+Маска фишек соперника, перекрашиваемых ходом в поле с номером bit_index
+"""
+
+
+def flips(own: int, opp: int, bit_index: int) -> int:
+    start = 1 << bit_index
+    result = 0
+    for step, guard in SHIFTS:
+        line = 0
+        x = shift(start, step, guard)
+        while x & opp:
+            line |= x
+            x = shift(x, step, guard)
+        if x & own:
+            result |= line
+    return result
+
+
+"""
+Выполняет ход и возвращает новые маски (своих, чужих) фишек
+"""
+
+
+def play(own: int, opp: int, bit_index: int) -> tuple[int, int]:
+    flipped = flips(own, opp, bit_index)
+    return own | flipped | (1 << bit_index), opp & ~flipped
+
+
+"""
+Число фишек в маске
+"""
+
+
+def count(mask: int) -> int:
+    return mask.bit_count()
+
+
+"""
+Отражение доски сверху вниз: строка i переходит в строку 7 - i
+"""
+
+
+def flip_vertical(mask: int) -> int:
+    return int.from_bytes(mask.to_bytes(8, "little"), "big")
+
+
+"""
+Отражение доски слева направо: столбец j переходит в столбец 7 - j
+"""
+
+
+def mirror_horizontal(mask: int) -> int:
+    mask = ((mask >> 1) & 0x5555555555555555) | ((mask & 0x5555555555555555) << 1)
+    mask = ((mask >> 2) & 0x3333333333333333) | ((mask & 0x3333333333333333) << 2)
+    return ((mask >> 4) & 0x0F0F0F0F0F0F0F0F) | ((mask & 0x0F0F0F0F0F0F0F0F) << 4)
+
+
+"""
+Отражение относительно главной диагонали: поле (i, j) переходит в (j, i)
+"""
+
+
+def transpose(mask: int) -> int:
+    t = 0x0F0F0F0F00000000 & (mask ^ (mask << 28))
+    mask ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (mask ^ (mask << 14))
+    mask ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (mask ^ (mask << 7))
+    mask ^= t ^ (t >> 7)
+    return mask & FULL
+
+
+"""
+Одна из 8 симметрий доски по номеру symmetry: бит 4 - транспонирование,
+бит 2 - отражение сверху вниз, бит 1 - слева направо, в этом порядке
+"""
+
+
+def transform(mask: int, symmetry: int) -> int:
+    if symmetry & 4:
+        mask = transpose(mask)
+    if symmetry & 2:
+        mask = flip_vertical(mask)
+    if symmetry & 1:
+        mask = mirror_horizontal(mask)
+    return mask
+
+
+"""
+Обратное к transform преобразование
+"""
+
+
+def restore(mask: int, symmetry: int) -> int:
+    if symmetry & 1:
+        mask = mirror_horizontal(mask)
+    if symmetry & 2:
+        mask = flip_vertical(mask)
+    if symmetry & 4:
+        mask = transpose(mask)
+    return mask
+
+
+"""
+Каноническая форма позиции среди 8 симметричных: наименьшая пара (свои, чужие)
+и номер симметрии, который переводит в нее исходную позицию
+"""
+
+
+def canonical(own: int, opp: int) -> tuple[int, int, int]:
+    best = None
+    for base, (own_t, opp_t) in ((0, (own, opp)), (4, (transpose(own), transpose(opp)))):
+        own_v, opp_v = flip_vertical(own_t), flip_vertical(opp_t)
+        for symmetry, pair in ((base, (own_t, opp_t)), (base | 1, (mirror_horizontal(own_t), mirror_horizontal(opp_t))),
+                               (base | 2, (own_v, opp_v)),
+                               (base | 3, (mirror_horizontal(own_v), mirror_horizontal(opp_v)))):
+            if best is None or pair < best[:2]:
+                best = pair + (symmetry,)
+    return best
@@ -0,0 +1,54 @@
+import mmap
+import os
+import struct
+
+# ===================================================================================
+# Opening book
+# ===================================================================================
+# A book file is a run of fixed-size records sorted by position hash:
+# Zobrist hash of the position (uint64), best move as x * 8 + y, search depth.
+# Lookups binary-search the memory-mapped file, nothing is loaded into Python objects.
+RECORD = struct.Struct("<QBB")
+
+
+class OpeningBook:
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.count = size // RECORD.size
+        # an empty file cannot be mapped
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+
+    def __len__(self):
+        return self.count
+
+    # returns ((x, y), depth) of the stored move or None
+    def lookup(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            stored, square, depth = RECORD.unpack_from(self.data, middle * RECORD.size)
+            if stored < key:
+                low = middle + 1
+            elif stored > key:
+                high = middle
+            else:
+                return divmod(square, 8), depth
+        return None
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+        self.file.close()
+
+
+# records are (hash, (x, y), depth); a hash seen twice keeps its first record
+def write_book(path, records):
+    unique = {}
+    for key, (x, y), depth in records:
+        unique.setdefault(key, (x * 8 + y, depth))
+    with open(path, "wb") as file:
+        for key in sorted(unique):
+            file.write(RECORD.pack(key, *unique[key]))
+    return len(unique)
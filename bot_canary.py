@@ -1,22 +1,54 @@
 import math
+import multiprocessing
+import os
+import random
+import threading
+import time
+import zlib
 from collections import OrderedDict
-from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 
+import bitboard
+import botworker
+import patterns
+import poscache
+import weights
+from book import OpeningBook
 from color import Color
 
+# NumPy is optional, without it the search evaluates leaves one by one
+try:
+    import numpy as np
+    import batch_eval
+except ImportError:
+    np = None
+    batch_eval = None
 
-def bot_turn(ed_board: list[list[Color]], ed_color: Color) -> tuple[int, int]:
-    new_board = OrderedDict((Cord(i, j), Color.EMPTY) for i in range(8) for j in range(8))
 
-    for i in range(8):
-        for j in range(8):
-            new_board[Cord(i, j)] = ed_board[i][j]
+def bot_turn(ed_board: list[list[Color]], ed_color: Color) -> tuple[int, int]:
+    new_board = OrderedDict((SQUARES[i][j], ed_board[i][j]) for i in range(8) for j in range(8))
 
     game = Game(new_board, ed_color)
-    move: Cord = BotAi.get_next_move(game, ed_color)
+    ponder = BotAi.pondering()
+    move: Cord = ponder.result(game, ed_color, BotAi.TIME_BUDGET) if ponder else None
+    if move is None:
+        move = BotAi.book_move(game)
+    if move is None:
+        move = BotAi.get_next_move(game, ed_color)
+    if ponder:
+        ponder.start(game, move, ed_color, BotAi.MAX_DEPTH)
     return move.x, move.y
 
+
+# called by game.session after every opponent move (ed_field is None for a pass);
+# a wrong guess stops pondering at once instead of at the next bot_turn.
+# Only exported where BotAi ponders, see the end of the module
+def bot_opponent_turn(ed_board: list[list[Color]], ed_color: Color, ed_field):
+    ponder = BotAi.pondering()
+    if ponder:
+        ponder.observe(*bitboard.from_board(ed_board), ed_color)
+
 # ===================================================================================
 # GameState
 # ===================================================================================
@@ -29,11 +61,13 @@ class GameState(Enum):
 # Coordinates
 # ===================================================================================
 class Cord():
+    __slots__ = ("x", "y", "_hash")
 
     # on difinition we pass x and y values to class
     def __init__(self, x, y):
         self.x = x
         self.y = y
+        self._hash = hash((x, y))
 
     # gets two cordinations and returns the sum of them as new Cord
     def __add__(self, other):
@@ -47,7 +81,7 @@ class Cord():
         return self.x != other.x or self.y != other.y
 
     def __hash__(self):
-        return hash((self.x, self.y))
+        return self._hash
 
     def __str__(self):
         return "({}, {})".format(self.x, self.y)
@@ -68,6 +102,51 @@ class Cord():
             coord += step
         return result
 
+
+# the 64 board squares are created once; boards, tables and moves all share these objects
+SQUARES = [[Cord(i, j) for j in range(8)] for i in range(8)]
+ALL_SQUARES = [cord for row in SQUARES for cord in row]
+
+# for every square and direction the squares met walking to the edge, nearest first
+RAYS = {SQUARES[i][j]: [ray for ray in ([SQUARES[i + k * x][j + k * y]
+                                         for k in range(1, 8) if 0 <= i + k * x < 8 and 0 <= j + k * y < 8]
+                                        for x, y in [(-1, -1), (-1, 0), (0, -1), (1, -1),
+                                                     (-1, 1), (0, 1), (1, 0), (1, 1)]) if ray]
+        for i in range(8) for j in range(8)}
+
+# ===================================================================================
+# Zobrist hashing
+# ===================================================================================
+# one random key per (color, square) and one for white to move, fixed seed keeps hashes
+# identical between runs
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST = {color: {cord: _zobrist_random.getrandbits(64) for cord in ALL_SQUARES}
+           for color in (Color.BLACK, Color.WHITE)}
+ZOBRIST_WHITE_TO_MOVE = _zobrist_random.getrandbits(64)
+
+# ===================================================================================
+# Evaluation tables
+# ===================================================================================
+# term weights and piece-square table of game_heuristic, from the tuned weights file if there is one
+WEIGHTS = weights.load()
+TERM_WEIGHTS = tuple(WEIGHTS[term] for term in weights.TERMS)
+V = WEIGHTS["V"]
+SQUARE_VALUE = {cord: V[cord.x][cord.y] for cord in ALL_SQUARES}
+SQUARE_BIT = {cord: 1 << (cord.x * 8 + cord.y) for cord in ALL_SQUARES}
+NEIGHBOURS = {cord: [ray[0] for ray in RAYS[cord]] for cord in ALL_SQUARES}
+CORNERS = {SQUARES[0][0], SQUARES[0][7], SQUARES[7][0], SQUARES[7][7]}
+
+# each corner with the three squares next to it
+CORNER_REGIONS = [
+    (SQUARES[0][0], [SQUARES[0][1], SQUARES[1][1], SQUARES[1][0]]),
+    (SQUARES[0][7], [SQUARES[0][6], SQUARES[1][6], SQUARES[1][7]]),
+    (SQUARES[7][0], [SQUARES[7][1], SQUARES[6][1], SQUARES[6][0]]),
+    (SQUARES[7][7], [SQUARES[6][7], SQUARES[6][6], SQUARES[7][6]]),
+]
+# the original heuristic compared (0, 7) and (7, 0) with ' ' instead of Color.EMPTY,
+# so only these two regions ever counted
+LEGACY_CORNER_REGIONS = [CORNER_REGIONS[0], CORNER_REGIONS[3]]
+
 # ===================================================================================
 # Game
 # ===================================================================================
@@ -78,24 +157,56 @@ class Game:
     def __init__(self, board = None, player = None):
 
         # creating the board as 64 tiles
-        self.board = OrderedDict((Cord(i, j), Color.EMPTY) for i in range(8) for j in range(8))
+        self.board = OrderedDict((cord, Color.EMPTY) for cord in ALL_SQUARES)
 
         if board is None:
-            self.board[Cord(3, 3)] = Color.WHITE
-            self.board[Cord(4, 4)] = Color.WHITE
-            self.board[Cord(3, 4)] = Color.BLACK
-            self.board[Cord(4, 3)] = Color.BLACK
+            self.board[SQUARES[3][3]] = Color.WHITE
+            self.board[SQUARES[4][4]] = Color.WHITE
+            self.board[SQUARES[3][4]] = Color.BLACK
+            self.board[SQUARES[4][3]] = Color.BLACK
         else:
-            self.board = deepcopy(board)
+            # keyed by the shared squares whatever Cord objects the caller used
+            self.board = OrderedDict((SQUARES[cord.x][cord.y], color) for cord, color in board.items())
 
         if player is None:
             self.current_player = Color.BLACK
         else:
             self.current_player = player
+
+        # position hash, kept up to date by play and change_player
+        self.hash = ZOBRIST_WHITE_TO_MOVE if self.current_player == Color.WHITE else 0
+        for cord, color in self.board.items():
+            if color != Color.EMPTY:
+                self.hash ^= ZOBRIST[color][cord]
         # creating initial scores
 
         self.whites = len(self.colored_fields(Color.WHITE))
         self.blacks = len(self.colored_fields(Color.BLACK))
+
+        # evaluation state, kept up to date by play and undo:
+        # disc masks, piece-square sum (black minus white), corners and frontier discs
+        self.black_mask = self.white_mask = 0
+        self.square_score = 0
+        self.black_corners = self.white_corners = 0
+        self.black_frontier = self.white_frontier = 0
+        self.empty_neighbours = {}
+        for cord, color in self.board.items():
+            empty_neighbours = sum(1 for field in NEIGHBOURS[cord] if self.board[field] == Color.EMPTY)
+            self.empty_neighbours[cord] = empty_neighbours
+            if color == Color.BLACK:
+                self.black_mask |= SQUARE_BIT[cord]
+                self.square_score += SQUARE_VALUE[cord]
+                self.black_corners += cord in CORNERS
+                self.black_frontier += empty_neighbours > 0
+            elif color == Color.WHITE:
+                self.white_mask |= SQUARE_BIT[cord]
+                self.square_score -= SQUARE_VALUE[cord]
+                self.white_corners += cord in CORNERS
+                self.white_frontier += empty_neighbours > 0
+
+        # legal moves of the side to move, generated on first use and dropped when the position changes
+        self._moves = None
+        self._move_set = None
         self.game_state = self.outcome()
 
     def enemy_color(self):
@@ -112,67 +223,158 @@ class Game:
         return coord.is_in_board() and self.board[coord] == Color.EMPTY
 
     def friend_fields(self):
-        fields = [Cord(i, j) for i in range(8) for j in range(8)]
-        return [cord for cord in fields if self.board[cord] == self.current_player]
+        return [cord for cord in ALL_SQUARES if self.board[cord] == self.current_player]
 
     def enemy_fields(self):
         enemy_color = self.enemy_color()
-        fields = [Cord(i, j) for i in range(8) for j in range(8)]
-        return [cord for cord in fields if self.board[cord] == enemy_color]
+        return [cord for cord in ALL_SQUARES if self.board[cord] == enemy_color]
 
     def colored_fields(self, color: Color):
-        fields = [Cord(i, j) for i in range(8) for j in range(8)]
-        return [cord for cord in fields if self.board[cord] == color]
+        return [cord for cord in ALL_SQUARES if self.board[cord] == color]
 
     def change_player(self):
         self.current_player = self.enemy_color()
+        self.hash ^= ZOBRIST_WHITE_TO_MOVE
+        self._moves = self._move_set = None
 
+    # cached list of generate_moves, shared by all callers until the next play, so it must not be modified
     def available_moves(self):
-        friends = self.friend_fields()
+        if self._moves is None:
+            self._moves = self.generate_moves()
+        return self._moves
+
+    # one entry per (friend, ray) that ends on an empty square, so a square can repeat
+    def generate_moves(self):
+        board = self.board
+        player = self.current_player
         av_fields = []
-        for friend in friends:
-            for direction in self.DIRECTIONS:
-                field = friend + direction
-                while self.is_enemy_field(field):
-                    field += direction
-                    if self.is_empty_field(field):
-                        av_fields += [field]
+        for friend in ALL_SQUARES:
+            if board[friend] != player:
+                continue
+            for ray in RAYS[friend]:
+                if board[ray[0]] == player or board[ray[0]] == Color.EMPTY:
+                    continue
+                for field in ray:
+                    color = board[field]
+                    if color == Color.EMPTY:
+                        av_fields.append(field)
+                        break
+                    if color == player:
+                        break
         return av_fields
 
     def is_valid_move(self, cord):
-        return cord in self.available_moves()
+        if self._move_set is None:
+            self._move_set = set(self.available_moves())
+        return cord in self._move_set
 
     def is_game_over(self):
         return self.game_state != GameState.IN_PROGRESS
 
-    def play(self, move):
-        if self.is_game_over():
-            raise Exception('Game has already ended')
-        if not self.is_valid_move(move):
-            raise Exception("Not valid move")
-
-        won_fields = []
-        for direction in self.DIRECTIONS:
-            field = move + direction
-            while self.is_enemy_field(field):
-                field += direction
-
-            if self.is_friend_field(field):
-                won_fields += move.to(field, direction)
-
-        for move in won_fields:
-            self.board[move] = self.current_player
-
-        self.blacks = len(self.colored_fields(Color.BLACK))
-        self.whites = len(self.colored_fields(Color.WHITE))
+    # plays the move and returns the record that undo needs to take it back:
+    # (move, flipped fields, player, blacks, whites, game state, hash,
+    #  black mask, white mask, square score, black/white corners, black/white frontier,
+    #  cached moves); the search passes validate=False for moves taken from available_moves
+    def play(self, move, validate=True):
+        if validate:
+            if self.is_game_over():
+                raise Exception('Game has already ended')
+            if not self.is_valid_move(move):
+                raise Exception("Not valid move")
+
+        player = self.current_player
+        board = self.board
+        move = SQUARES[move.x][move.y]
+        flipped = []
+        for ray in RAYS[move]:
+            for k, field in enumerate(ray):
+                color = board[field]
+                if color == Color.EMPTY:
+                    break
+                if color == player:
+                    flipped += ray[:k]
+                    break
+
+        record = (move, flipped, player, self.blacks, self.whites, self.game_state, self.hash,
+                  self.black_mask, self.white_mask, self.square_score,
+                  self.black_corners, self.white_corners, self.black_frontier, self.white_frontier,
+                  self._moves, self._move_set)
+
+        # frontier changes for the player and the enemy: neighbours of the move may lose
+        # their last empty neighbour, flipped frontier discs change sides
+        empty_neighbours = self.empty_neighbours
+        player_frontier = enemy_frontier = 0
+        for field in NEIGHBOURS[move]:
+            empty_neighbours[field] -= 1
+            if not empty_neighbours[field]:
+                if board[field] == player:
+                    player_frontier -= 1
+                elif board[field] != Color.EMPTY:
+                    enemy_frontier -= 1
+        if empty_neighbours[move]:
+            player_frontier += 1
+
+        friend_keys = ZOBRIST[player]
+        enemy_keys = ZOBRIST[self.enemy_color()]
+        board[move] = player
+        self.hash ^= friend_keys[move]
+        flipped_mask = 0
+        flipped_value = 0
+        for field in flipped:
+            board[field] = player
+            self.hash ^= enemy_keys[field] ^ friend_keys[field]
+            flipped_mask |= SQUARE_BIT[field]
+            flipped_value += SQUARE_VALUE[field]
+            if empty_neighbours[field]:
+                player_frontier += 1
+                enemy_frontier -= 1
+
+        if player == Color.BLACK:
+            self.blacks += len(flipped) + 1
+            self.whites -= len(flipped)
+            self.black_mask |= flipped_mask | SQUARE_BIT[move]
+            self.white_mask ^= flipped_mask
+            self.square_score += SQUARE_VALUE[move] + 2 * flipped_value
+            self.black_corners += move in CORNERS
+            self.black_frontier += player_frontier
+            self.white_frontier += enemy_frontier
+        else:
+            self.whites += len(flipped) + 1
+            self.blacks -= len(flipped)
+            self.white_mask |= flipped_mask | SQUARE_BIT[move]
+            self.black_mask ^= flipped_mask
+            self.square_score -= SQUARE_VALUE[move] + 2 * flipped_value
+            self.white_corners += move in CORNERS
+            self.white_frontier += player_frontier
+            self.black_frontier += enemy_frontier
         self.change_player()
         self.game_state = self.outcome()
-
+        return record
+
+    # restores the position from before the play that returned the record
+    def undo(self, record):
+        (move, flipped, player, self.blacks, self.whites, self.game_state, self.hash,
+         self.black_mask, self.white_mask, self.square_score,
+         self.black_corners, self.white_corners, self.black_frontier, self.white_frontier,
+         self._moves, self._move_set) = record
+        enemy = Color.BLACK if player == Color.WHITE else Color.WHITE
+        self.board[move] = Color.EMPTY
+        for field in flipped:
+            self.board[field] = enemy
+        for field in NEIGHBOURS[move]:
+            self.empty_neighbours[field] += 1
+        self.current_player = player
+
+    # resolves a pass on the disc masks, the move list itself is only built when asked for
     def outcome(self):
-        if not self.available_moves():
+        if self.current_player == Color.BLACK:
+            own, opp = self.black_mask, self.white_mask
+        else:
+            own, opp = self.white_mask, self.black_mask
+        if not bitboard.moves(own, opp):
             self.change_player()
 
-            if not self.available_moves():
+            if not bitboard.moves(opp, own):
                 if self.whites > self.blacks:
                     return GameState.WHITE_WINS
                 elif self.whites < self.blacks:
@@ -204,15 +406,547 @@ class FormatConverter:
 
     @staticmethod
     def ai_to_game_board(ai_board):
-        return OrderedDict((Cord(i, j), ai_board[i][j])
+        return OrderedDict((SQUARES[i][j], ai_board[i][j])
                            for i in range(8) for j in range(8))
 
     @staticmethod
     def game_to_ai_board(game_board):
-        return [[game_board[Cord(i, j)] for j in range(8)] for i in range(8)]
+        return [[game_board[SQUARES[i][j]] for j in range(8)] for i in range(8)]
+
+
+# ===================================================================================
+# Search
+# ===================================================================================
+# runs in a worker process of BotAi.parallel_next_move: deepens over the given root moves
+# and returns the (depth, value, (x, y)) of every completed iteration and the node count
+def search_root_moves(board, color, moves, time_budget, max_depth, deterministic):
+    game = Game(FormatConverter.ai_to_game_board(board), color)
+    if deterministic:
+        BotAi.table.clear()
+    state = SearchState(time_budget)
+    state.root_moves = [SQUARES[x][y] for x, y in moves]
+    iterations = [(depth, value, (move.x, move.y))
+                  for depth, value, move in BotAi.deepen(game, color, state, max_depth)]
+    return iterations, state.nodes
+
+
+# corners go first and X-squares last, everything else is ordered by killers and history
+SQUARE_PRIORITY = {
+    SQUARES[0][0]: 3, SQUARES[0][7]: 3, SQUARES[7][0]: 3, SQUARES[7][7]: 3,
+    SQUARES[1][1]: 0, SQUARES[1][6]: 0, SQUARES[6][1]: 0, SQUARES[6][6]: 0,
+}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchState:
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.started = time.perf_counter()
+        # no deadline until the first iteration completes
+        self.deadline = None
+        self.nodes = 0
+        self.depth = 0
+        self.elapsed = 0.0
+        self.pv_move = None
+        # restricts the root to a share of its moves in parallel search
+        self.root_moves = None
+        self.killers = [[] for _ in range(64)]
+        self.history = {}
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    # a move that caused a beta cutoff becomes a killer at its ply and gains history
+    def store_cutoff(self, move, depth, ply):
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+
+class TranspositionTable:
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    # rough footprint of a stored entry: the tuple, its key, score and move
+    ENTRY_BYTES = 256
+
+    # every bucket holds a depth-preferred slot and an always-replace slot
+    def __init__(self, megabytes):
+        buckets = max(1, int(megabytes * 2 ** 20) // (2 * self.ENTRY_BYTES))
+        self.mask = (1 << (buckets.bit_length() - 1)) - 1
+        self.slots = [None] * (2 * (self.mask + 1))
+        self.generation = 0
+        self.discs = 64
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def clear(self):
+        self.slots = [None] * len(self.slots)
+        self.generation = 0
+        self.hits = self.misses = self.collisions = 0
+
+    # called once per move: a position with fewer discs than the previous one is a new game
+    def new_search(self, discs):
+        if discs < self.discs:
+            self.clear()
+        self.discs = discs
+        self.generation += 1
+
+    # entry is (key, depth, bound, score, move, generation)
+    def probe(self, key):
+        index = (key & self.mask) << 1
+        deep = self.slots[index]
+        if deep is not None and deep[0] == key:
+            self.hits += 1
+            return deep
+        recent = self.slots[index + 1]
+        if recent is not None and recent[0] == key:
+            self.hits += 1
+            return recent
+        self.misses += 1
+        if deep is not None or recent is not None:
+            self.collisions += 1
+        return None
+
+    # the deep slot keeps the deepest entry of the current search, the other slot takes the rest
+    def store(self, key, depth, bound, score, move):
+        index = (key & self.mask) << 1
+        entry = (key, depth, bound, score, move, self.generation)
+        deep = self.slots[index]
+        if deep is None or deep[0] == key or depth >= deep[1] or deep[5] != self.generation:
+            self.slots[index] = entry
+        else:
+            self.slots[index + 1] = entry
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "capacity": len(self.slots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "hit rate": self.hits / probes if probes else 0.0,
+        }
+
+
+# ===================================================================================
+# Endgame solver
+# ===================================================================================
+# the four 4x4 quadrants, parity ordering plays first into quadrants with an odd number of empties
+QUADRANTS = [0x0F0F0F0F, 0xF0F0F0F0, 0x0F0F0F0F00000000, 0xF0F0F0F000000000]
+CORNER_BITS = (1 << 0) | (1 << 7) | (1 << 56) | (1 << 63)
+
+
+class EndgameSolver:
+    # with more empties than this moves are ordered fastest-first, below it by parity
+    FASTEST_FIRST_EMPTIES = 7
+
+    def __init__(self, time_budget):
+        self.started = time.perf_counter()
+        self.deadline = self.started + time_budget
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.score = None
+
+    # exact disc differential (or its sign when wld) for the side owning own, with the best
+    # move as x * 8 + y
+    def best_move(self, own, opp, wld=False):
+        alpha, beta = (-1, 1) if wld else (-64, 64)
+        best_value, best_square = -65, None
+        for square, flipped in self.ordered_moves(own, opp):
+            value = -self.search(opp & ~flipped, own | flipped | (1 << square), -beta, -alpha)
+            if value > best_value:
+                best_value, best_square = value, square
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+        self.score = max(-1, min(1, best_value)) if wld else best_value
+        self.elapsed = time.perf_counter() - self.started
+        return self.score, best_square
+
+    def search(self, own, opp, alpha, beta):
+        self.nodes += 1
+        if not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        if not bitboard.moves(own, opp):
+            if not bitboard.moves(opp, own):
+                return own.bit_count() - opp.bit_count()
+            return -self.search(opp, own, -beta, -alpha)
+
+        best_value = -65
+        for square, flipped in self.ordered_moves(own, opp):
+            value = -self.search(opp & ~flipped, own | flipped | (1 << square), -beta, -alpha)
+            if value > best_value:
+                best_value = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+        return best_value
+
+    # (square, flipped mask) of every move: fastest-first (fewest replies, corners first)
+    # while the tree is wide, odd quadrants first near the end
+    def ordered_moves(self, own, opp):
+        empty = bitboard.FULL & ~(own | opp)
+        children = [(square, bitboard.flips(own, opp, square))
+                    for square in bitboard.squares(bitboard.moves(own, opp))]
+        if empty.bit_count() > self.FASTEST_FIRST_EMPTIES:
+            def replies(child):
+                square, flipped = child
+                mobility = bitboard.moves(opp & ~flipped, own | flipped | (1 << square)).bit_count()
+                return mobility - (1 << square & CORNER_BITS > 0)
+            children.sort(key=replies)
+        else:
+            odd = 0
+            for quadrant in QUADRANTS:
+                if (empty & quadrant).bit_count() & 1:
+                    odd |= quadrant
+            children.sort(key=lambda child: not (1 << child[0]) & odd)
+        return children
+
+
+# ===================================================================================
+# Monte Carlo tree search
+# ===================================================================================
+class MctsNode:
+    __slots__ = ("own", "opp", "square", "parent", "children", "untried", "visits", "score")
+
+    # own and opp are the masks of the side to move, square is the move that led here
+    # (None for a pass); score sums the rewards of the side that played it
+    def __init__(self, own, opp, square, parent):
+        self.own = own
+        self.opp = opp
+        self.square = square
+        self.parent = parent
+        self.children = []
+        # moves without a child yet, None until the node is first expanded
+        self.untried = None
+        self.visits = 0
+        self.score = 0.0
+
+    # legal squares, [None] for a forced pass, [] when the game is over
+    def legal_moves(self):
+        moves = bitboard.moves(self.own, self.opp)
+        if moves:
+            return bitboard.squares(moves)
+        if bitboard.moves(self.opp, self.own):
+            return [None]
+        return []
+
+    def child(self, square):
+        if square is None:
+            return MctsNode(self.opp, self.own, None, self)
+        flipped = bitboard.flips(self.own, self.opp, square)
+        return MctsNode(self.opp & ~flipped, self.own | flipped | (1 << square), square, self)
+
+
+class MonteCarloTree:
+    # rough footprint of a node: the object, its masks, child and untried lists
+    NODE_BYTES = 300
+
+    def __init__(self, max_nodes, exploration):
+        self.max_nodes = max_nodes
+        self.exploration = exploration
+        self.random = random.Random()
+        self.root = None
+        self.nodes = 0
+        # statistics of the latest search
+        self.playouts = 0
+        self.elapsed = 0.0
+        self.reused = 0
+
+    def playouts_per_second(self):
+        return self.playouts / self.elapsed if self.elapsed else 0.0
+
+    def memory_bytes(self):
+        return self.nodes * self.NODE_BYTES
+
+    # keeps the subtree of the new position when it is the old root, a child or a grandchild,
+    # i.e. after our move and the opponent's reply
+    def set_root(self, own, opp):
+        candidates = []
+        if self.root is not None:
+            candidates = [self.root] + self.root.children
+            candidates += [grandchild for child in self.root.children for grandchild in child.children]
+        for node in candidates:
+            if node.own == own and node.opp == opp:
+                node.parent = None
+                self.root = node
+                self.nodes = self.count(node)
+                self.reused = node.visits
+                return
+        self.root = MctsNode(own, opp, None, None)
+        self.nodes = 1
+        self.reused = 0
+
+    @staticmethod
+    def count(node):
+        total = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            total += 1
+            stack.extend(node.children)
+        return total
+
+    # anytime search: runs until the deadline or max_playouts (0 - no limit), at least one playout;
+    # returns the most visited root move as x * 8 + y, None for a pass or a finished game
+    def search(self, own, opp, time_budget, max_playouts=0):
+        started = time.perf_counter()
+        deadline = started + time_budget
+        self.set_root(own, opp)
+        self.playouts = 0
+        while True:
+            if self.nodes >= self.max_nodes:
+                self.prune()
+            self.iterate()
+            self.playouts += 1
+            if max_playouts and self.playouts >= max_playouts:
+                break
+            if time.perf_counter() > deadline:
+                break
+        self.elapsed = time.perf_counter() - started
+        if not self.root.children:
+            return None
+        return max(self.root.children, key=lambda child: child.visits).square
+
+    # selection by UCT, expansion of one child, a random playout and backpropagation
+    def iterate(self):
+        node = self.root
+        while node.children and not node.untried and node.untried is not None:
+            node = self.select(node)
+        if node.untried is None:
+            node.untried = node.legal_moves()
+            self.random.shuffle(node.untried)
+        if node.untried:
+            child = node.child(node.untried.pop())
+            node.children.append(child)
+            self.nodes += 1
+            node = child
+
+        margin = self.playout(node.own, node.opp)
+        # reward of the side to move at node, it alternates on the way up
+        reward = 1.0 if margin > 0 else 0.5 if margin == 0 else 0.0
+        while node is not None:
+            node.visits += 1
+            node.score += 1.0 - reward
+            reward = 1.0 - reward
+            node = node.parent
+
+    def select(self, node):
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        return max(node.children,
+                   key=lambda child: child.score / child.visits + exploration * math.sqrt(log_visits / child.visits))
+
+    # plays random moves to the end, the disc margin is from the point of view of the side to move
+    def playout(self, own, opp):
+        choice = self.random.choice
+        sign = 1
+        passed = False
+        while True:
+            moves = bitboard.moves(own, opp)
+            if moves:
+                square = choice(bitboard.squares(moves))
+                flipped = bitboard.flips(own, opp, square)
+                own, opp = opp & ~flipped, own | flipped | (1 << square)
+                passed = False
+            elif passed:
+                break
+            else:
+                own, opp = opp, own
+                passed = True
+            sign = -sign
+        return sign * (own.bit_count() - opp.bit_count())
+
+    # collapses the least visited subtrees back into leaves until the tree is at half its cap;
+    # the collapsed nodes keep their statistics and expand again when search returns to them
+    def prune(self):
+        threshold = 1
+        while self.nodes > self.max_nodes // 2 and threshold <= self.root.visits:
+            stack = list(self.root.children)
+            while stack:
+                node = stack.pop()
+                if node.children and node.visits <= threshold:
+                    self.nodes -= self.count(node) - 1
+                    node.children = []
+                    node.untried = None
+                else:
+                    stack.extend(node.children)
+            threshold *= 2
+
+
+# ===================================================================================
+# Pondering
+# ===================================================================================
+# searches the position expected after the opponent's reply in a background thread while the
+# opponent thinks. The reply is the one the table holds for the position after our move.
+# The thread shares BotAi.table, so after a wrong guess its work still serves the real search.
+# Threads share the GIL, so BotAi only ponders inside a botworker host: in the referee process
+# the thread would slow down the opponent while its clock runs.
+class Ponderer:
+
+    def __init__(self, limit):
+        # a ponder search ends by itself after this many seconds, e.g. when the game is over
+        self.limit = limit
+        self.thread = None
+        self.state = None
+        # the pondered position, the search thread plays its moves on a copy
+        self.position = None
+        self.hits = 0
+        self.misses = 0
+
+    # the position after move and the predicted reply with color to move, None without a guess
+    @staticmethod
+    def predict(game: Game, move, color):
+        game = Game(game.board, game.current_player)
+        game.play(move, validate=False)
+        if not game.is_game_over() and game.current_player != color:
+            entry = BotAi.table.probe(game.hash)
+            reply = entry[4] if entry is not None else None
+            if reply is None or not game.is_valid_move(reply):
+                return None
+            game.play(reply, validate=False)
+        if game.is_game_over() or game.current_player != color:
+            return None
+        return game
+
+    def start(self, game: Game, move, color, max_depth):
+        self.stop()
+        game = self.predict(game, move, color)
+        # the endgame solver does not use the table, so there is nothing to prepare for it
+        if game is None or 64 - game.blacks - game.whites <= BotAi.ENDGAME_EMPTIES:
+            return
+        self.position = (game.black_mask, game.white_mask, color)
+        self.state = SearchState(self.limit)
+        self.thread = threading.Thread(target=self.run, args=(game, color, self.state, max_depth), daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def run(game: Game, color, state, max_depth):
+        for _ in BotAi.deepen(game, color, state, max_depth):
+            pass
+
+    # ends the search after time_budget more seconds (at once by default) and waits for it
+    def stop(self, time_budget=0.0):
+        if self.thread is None:
+            return None
+        state = self.state
+        deadline = time.perf_counter() + time_budget
+        # deepen resets the deadline from the budget after every iteration
+        state.budget = deadline - state.started
+        state.deadline = deadline
+        self.thread.join()
+        self.thread = None
+        return state
+
+    # the opponent's move is known: a miss frees the core and the table right away
+    def observe(self, black, white, color):
+        if self.thread is not None and self.position != (black, white, color):
+            self.misses += 1
+            self.stop()
+
+    # on a hit the search goes on for time_budget more seconds and gives the move, else None
+    def result(self, game: Game, color, time_budget):
+        if self.thread is None:
+            return None
+        if self.position != (game.black_mask, game.white_mask, color):
+            self.misses += 1
+            self.stop()
+            return None
+        self.hits += 1
+        state = self.stop(time_budget)
+        state.finish()
+        BotAi.last_search = state
+        return state.pv_move
 
 
 class BotAi:
+    # strength/latency tradeoff: seconds per move and the deepest iteration allowed
+    TIME_BUDGET = float(os.environ.get("REVERSI_TIME_BUDGET", "1.0"))
+    MAX_DEPTH = int(os.environ.get("REVERSI_MAX_DEPTH", "60"))
+
+    # shared by consecutive bot_turn calls, so the previous move's work is reused
+    table = TranspositionTable(float(os.environ.get("REVERSI_TT_MB", "16")))
+
+    # statistics of the latest get_next_move call
+    last_search = None
+
+    # opening book built by build_book.py, opened on first use when the file exists
+    BOOK_PATH = os.environ.get("REVERSI_BOOK",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin"))
+    book = None
+
+    # positions with this many empties or fewer are solved exactly; with ENDGAME_WLD
+    # the solver only proves win/loss/draw, which is faster
+    ENDGAME_EMPTIES = int(os.environ.get("REVERSI_ENDGAME_EMPTIES", "10"))
+    ENDGAME_WLD = os.environ.get("REVERSI_ENDGAME_WLD") == "1"
+    # the latest EndgameSolver with its score, nodes and solve time
+    last_solve = None
+
+    # processes for root splitting, 1 keeps the whole search in this process
+    WORKERS = int(os.environ.get("REVERSI_WORKERS", "1"))
+    # workers search to DETERMINISTIC_DEPTH with a cleared table and no deadline, so the move
+    # does not depend on timing; the depth is fixed because nothing else stops the search
+    DETERMINISTIC = os.environ.get("REVERSI_DETERMINISTIC") == "1"
+    DETERMINISTIC_DEPTH = int(os.environ.get("REVERSI_DETERMINISTIC_DEPTH", "4"))
+    executor = None
+
+    # opt-in fixes of game_heuristic terms that the original code never counted,
+    # on when the weights file was tuned with them
+    FIX_CORNER_CLOSENESS = WEIGHTS["fix corner closeness"]
+    FIX_FRONTIER = WEIGHTS["fix frontier"]
+
+    # leaf evaluation: "heuristic" - game_heuristic, "patterns" - the table-driven patterns.evaluate
+    EVALUATOR = os.environ.get("REVERSI_EVALUATOR", "heuristic")
+
+    # with a position cache (poscache, shared between tournament processes) solved positions and
+    # fixed-depth results are answered from it and other best moves seed the move ordering;
+    # CACHE_VALUES caches leaf scores as well, for evaluators that do not change under symmetry
+    CACHE_VALUES = os.environ.get("REVERSI_CACHE_VALUES") == "1"
+    # depth stored with exact endgame results
+    SOLVED_DEPTH = 64
+    # cache entries of other evaluator settings are ignored, set by get_next_move
+    cache_tag = 0
+
+    # score the children of depth-1 nodes with one batch_eval call instead of one by one
+    # (batch_eval implements game_heuristic only)
+    BATCH_LEAVES = batch_eval is not None and os.environ.get("REVERSI_BATCH_LEAVES", "1") == "1"
+
+    # "mcts" replaces the alpha-beta search with Monte Carlo tree search; the tree is kept
+    # between moves, capped at MCTS_NODES nodes, and a search stops at the time budget
+    # or after MCTS_PLAYOUTS playouts (0 - no limit)
+    ENGINE = os.environ.get("REVERSI_ENGINE", "minimax")
+    MCTS_PLAYOUTS = int(os.environ.get("REVERSI_MCTS_PLAYOUTS", "0"))
+    MCTS_NODES = int(os.environ.get("REVERSI_MCTS_NODES", "200000"))
+    MCTS_EXPLORATION = 1.4
+    # holds the statistics of the latest search as well
+    mcts = None
+
+    # keep searching on the opponent's time (alpha-beta only, see Ponderer)
+    PONDER = os.environ.get("REVERSI_PONDER") == "1" and ENGINE == "minimax" and WORKERS == 1
+    PONDER_LIMIT = float(os.environ.get("REVERSI_PONDER_LIMIT", "30"))
+    # created on the first move made inside a botworker host, never in the referee process
+    ponder = None
+
+    @staticmethod
+    def pondering():
+        if BotAi.ponder is None and BotAi.PONDER and botworker.hosted:
+            BotAi.ponder = Ponderer(BotAi.PONDER_LIMIT)
+        return BotAi.ponder
 
     # finding available moves
     @staticmethod
@@ -221,61 +955,287 @@ class BotAi:
         return game.available_moves()
 
 
-    # runs the minimax with precision
+    # the book move for the position, None when the book has none
+    @staticmethod
+    def book_move(game: Game):
+        if BotAi.book is None:
+            BotAi.book = OpeningBook(BotAi.BOOK_PATH) if os.path.exists(BotAi.BOOK_PATH) else False
+        if not BotAi.book:
+            return None
+        entry = BotAi.book.lookup(game.hash)
+        if entry is None:
+            return None
+        move = SQUARES[entry[0][0]][entry[0][1]]
+        # a hash collision must not turn into an illegal move
+        return move if move in game.available_moves() else None
+
+    # iterative deepening: every finished iteration gives a usable move,
+    # the search stops when the time budget runs out
+    @staticmethod
+    def get_next_move(game: Game, color, time_budget=None, max_depth=None) -> Cord:
+        time_budget = BotAi.TIME_BUDGET if time_budget is None else time_budget
+        max_depth = BotAi.MAX_DEPTH if max_depth is None else max_depth
+        empties = 64 - game.blacks - game.whites
+        if color == Color.BLACK:
+            own, opp = game.black_mask, game.white_mask
+        else:
+            own, opp = game.white_mask, game.black_mask
+        cache = poscache.default()
+        cached = None
+        if cache is not None:
+            BotAi.cache_tag = BotAi.evaluation_tag()
+            entry = cache.lookup(own, opp, BotAi.cache_tag)
+            if entry is not None and entry[2] is not None:
+                cached = ALL_SQUARES[entry[2]]
+                if entry[3] >= min(max_depth, empties):
+                    return cached
+
+        if empties <= BotAi.ENDGAME_EMPTIES:
+            solver = EndgameSolver(time_budget)
+            move = BotAi.solve_endgame(game, color, solver)
+            if move is not None:
+                if cache is not None and not BotAi.ENDGAME_WLD:
+                    cache.store(own, opp, best=move.x * 8 + move.y, depth=BotAi.SOLVED_DEPTH, tag=BotAi.cache_tag)
+                return move
+            # not solved in time: the heuristic search gets what is left
+            time_budget = max(0.0, time_budget - (time.perf_counter() - solver.started))
+        if BotAi.ENGINE == "mcts":
+            return BotAi.mcts_next_move(game, color, time_budget)
+        # daemonic processes (multiprocessing.Pool workers, botworker hosts) cannot start processes of their own;
+        # tournament workers are not daemonic, tournament.init_worker sets REVERSI_WORKERS=1 there instead
+        if BotAi.WORKERS > 1 and not multiprocessing.current_process().daemon:
+            return BotAi.parallel_next_move(game, color, time_budget, max_depth)
+
+        state = SearchState(time_budget)
+        state.pv_move = cached
+        best_move = None
+        for depth, value, move in BotAi.deepen(game, color, state, max_depth):
+            best_move = move
+        state.finish()
+        BotAi.last_search = state
+        if cache is not None and best_move is not None:
+            cache.store(own, opp, best=best_move.x * 8 + best_move.y, depth=state.depth, tag=BotAi.cache_tag)
+        return best_move
+
+    # identifies the evaluator settings whose values and moves may be shared through the cache
+    @staticmethod
+    def evaluation_tag():
+        settings = (BotAi.EVALUATOR, TERM_WEIGHTS, V, BotAi.FIX_FRONTIER, BotAi.FIX_CORNER_CLOSENESS)
+        return zlib.crc32(repr(settings).encode())
+
+    # the legacy corner closeness counts two of the four corners, so its scores change under
+    # reflection and cannot be shared between symmetric positions
     @staticmethod
-    def get_next_move(game: Game, color) -> Cord:
-        # the depth argument defines how many levels deep we go before using heuristic
-        (df, move) = BotAi.minimax(game.board, 2, color, color)
-        return move
+    def symmetric_evaluation():
+        return BotAi.EVALUATOR == "patterns" or BotAi.FIX_CORNER_CLOSENESS
 
     @staticmethod
-    def minimax(board, depth, player, original_player):
-        game = Game(board, player)
-        # if game is over then return something
-        if game.is_game_over() or depth == 0:
-            return BotAi.game_heuristic(board, original_player), None
+    def mcts_next_move(game: Game, color, time_budget) -> Cord:
+        if BotAi.mcts is None:
+            BotAi.mcts = MonteCarloTree(BotAi.MCTS_NODES, BotAi.MCTS_EXPLORATION)
+        if color == Color.BLACK:
+            own, opp = game.black_mask, game.white_mask
+        else:
+            own, opp = game.white_mask, game.black_mask
+        square = BotAi.mcts.search(own, opp, time_budget, BotAi.MCTS_PLAYOUTS)
+        return ALL_SQUARES[square]
 
+    # the exact best move, None when the solver runs out of time
+    @staticmethod
+    def solve_endgame(game: Game, color, solver):
+        if color == Color.BLACK:
+            own, opp = game.black_mask, game.white_mask
+        else:
+            own, opp = game.white_mask, game.black_mask
+        try:
+            _, square = solver.best_move(own, opp, BotAi.ENDGAME_WLD)
+        except SearchTimeout:
+            return None
+        BotAi.last_solve = solver
+        return ALL_SQUARES[square]
+
+    # yields (depth, value, move) for every completed iteration
+    @staticmethod
+    def deepen(game: Game, color, state, max_depth):
+        empties = 64 - game.blacks - game.whites
+        BotAi.table.new_search(game.blacks + game.whites)
+
+        for depth in range(1, max_depth + 1):
+            try:
+                value, move = BotAi.minimax(game, depth, -math.inf, math.inf, color, state)
+            except SearchTimeout:
+                return
+            state.pv_move = move
+            state.depth = depth
+            # the first iteration always completes, later ones are interrupted by the deadline
+            state.deadline = state.started + state.budget
+            yield depth, value, move
+            # the whole game tree has been searched, deeper iterations change nothing
+            if depth >= empties:
+                return
+            # the next iteration is several times more expensive than all previous ones
+            if time.perf_counter() - state.started > state.budget / 2:
+                return
+
+    # root splitting: the ordered root moves are dealt round-robin to worker processes,
+    # each deepens its share and the results are merged at the depth all of them reached
+    @staticmethod
+    def parallel_next_move(game: Game, color, time_budget, max_depth) -> Cord:
+        state = SearchState(time_budget)
+        moves = BotAi.order_moves(game.available_moves(), state, 0)
+        workers = min(BotAi.WORKERS, len(moves))
+        if BotAi.DETERMINISTIC:
+            time_budget = math.inf
+            max_depth = min(max_depth, BotAi.DETERMINISTIC_DEPTH, 64 - game.blacks - game.whites)
+        if BotAi.executor is None:
+            BotAi.executor = ProcessPoolExecutor(BotAi.WORKERS)
+
+        board = FormatConverter.game_to_ai_board(game.board)
+        futures = [BotAi.executor.submit(search_root_moves, board, color,
+                                         [(move.x, move.y) for move in moves[k::workers]],
+                                         time_budget, max_depth, BotAi.DETERMINISTIC)
+                   for k in range(workers)]
+        reports = [future.result() for future in futures]
+
+        depth = min(len(iterations) for iterations, _ in reports)
+        candidates = [(iterations[depth - 1][1], SQUARES[iterations[depth - 1][2][0]][iterations[depth - 1][2][1]]) for iterations, _ in reports]
+        # equal values go to the move that came first in the root ordering
+        _, best_move = max(candidates, key=lambda candidate: (candidate[0], -moves.index(candidate[1])))
+
+        state.depth = depth
+        state.nodes = sum(nodes for _, nodes in reports)
+        state.finish()
+        BotAi.last_search = state
+        return best_move
+
+    # negamax with alpha-beta pruning, the value is from the point of view of color
+    @staticmethod
+    def minimax(game: Game, depth, alpha, beta, color, state, ply=0):
+        state.nodes += 1
+        if state.deadline is not None and time.perf_counter() > state.deadline:
+            raise SearchTimeout()
+
+        if game.is_game_over():
+            return BotAi.evaluate(game, color), None
+
+        table = BotAi.table
+        entry = table.probe(game.hash)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[4]
+            if entry[1] >= depth and ply > 0:
+                bound, score = entry[2], entry[3]
+                if bound == TranspositionTable.EXACT \
+                        or (bound == TranspositionTable.LOWER and score >= beta) \
+                        or (bound == TranspositionTable.UPPER and score <= alpha):
+                    return score, tt_move
+
+        if depth == 0:
+            value = BotAi.evaluate(game, color)
+            table.store(game.hash, 0, TranspositionTable.EXACT, value, None)
+            return value, None
+
+        # a root-split worker searches only its share of the root moves
+        moves = state.root_moves if ply == 0 and state.root_moves else game.available_moves()
+        if depth == 1 and BotAi.BATCH_LEAVES and BotAi.EVALUATOR == "heuristic":
+            value, move = BotAi.evaluate_children(game, color, moves, state)
+            if ply or not state.root_moves:
+                table.store(game.hash, 1, TranspositionTable.EXACT, value, move)
+            return value, move
+
+        alpha_orig = alpha
+        enemy = Color.BLACK if color == Color.WHITE else Color.WHITE
+        best_value = -math.inf
         best_move = None
+        first = state.pv_move if ply == 0 else tt_move
+        for move in BotAi.order_moves(moves, state, ply, first):
+            record = game.play(move, validate=False)
+            try:
+                # a pass keeps the turn, so the child is searched from the same side
+                if not game.is_game_over() and game.current_player == color:
+                    value, _ = BotAi.minimax(game, depth - 1, alpha, beta, color, state, ply + 1)
+                else:
+                    value, _ = BotAi.minimax(game, depth - 1, -beta, -alpha, enemy, state, ply + 1)
+                    value = -value
+            finally:
+                game.undo(record)
+            if value > best_value:
+                best_value = value
+                best_move = move
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                state.store_cutoff(move, depth, ply)
+                break
+
+        if best_value <= alpha_orig:
+            bound = TranspositionTable.UPPER
+        elif best_value >= beta:
+            bound = TranspositionTable.LOWER
+        else:
+            bound = TranspositionTable.EXACT
+        # a root searched over a share of its moves has no value of its own
+        if ply or not state.root_moves:
+            table.store(game.hash, depth, bound, best_value, best_move)
+        return best_value, best_move
+
+    # game_heuristic is antisymmetric, so every child is scored from the mover's side
+    # and the best one needs no negation, passes and finished games included
+    @staticmethod
+    def evaluate_children(game: Game, color, moves, state):
+        if color == Color.BLACK:
+            own, opp = game.black_mask, game.white_mask
+        else:
+            own, opp = game.white_mask, game.black_mask
+        moves = list(OrderedDict.fromkeys(moves))
+        children = np.array([bitboard.play(own, opp, move.x * 8 + move.y) for move in moves], dtype=np.uint64)
+        scores = batch_eval.evaluate(children, BotAi.FIX_FRONTIER, BotAi.FIX_CORNER_CLOSENESS)
+        state.nodes += len(moves)
+        best = int(np.argmax(scores))
+        return float(scores[best]), moves[best]
+
+    # previous iteration's best move, corners, killers, quiet moves by history, X-squares last
+    @staticmethod
+    def order_moves(moves, state, ply, first=None):
+        killers = state.killers[ply] if ply < len(state.killers) else ()
 
-        max_player = player == original_player
-        # if it is a max node
-        if max_player:
-            best_value = -math.inf
-            available_moves = game.available_moves()
-            for move in available_moves:
-                game_bckp = deepcopy(game)
-                game.play(move)
-                value, _ = BotAi.minimax(game.board, depth - 1, game.current_player, original_player)
-                game = game_bckp #revert move
-                if value > best_value:
-                    best_value = value
-                    best_move = move
-            return best_value, best_move
-
-        # if it is a min node
+        def rank(move):
+            if first is not None and move == first:
+                return 4, 0
+            priority = SQUARE_PRIORITY.get(move, 1)
+            if priority == 1 and move in killers:
+                priority = 2
+            return priority, state.history.get(move, 0)
+
+        return sorted(OrderedDict.fromkeys(moves), key=rank, reverse=True)
+
+    # the score of a leaf from the point of view of color, by the selected evaluator
+    @staticmethod
+    def evaluate(game: Game, color):
+        if color == Color.BLACK:
+            own, opp = game.black_mask, game.white_mask
+        else:
+            own, opp = game.white_mask, game.black_mask
+        cache = poscache.default() if BotAi.CACHE_VALUES and BotAi.symmetric_evaluation() else None
+        if cache is not None:
+            entry = cache.lookup(own, opp, BotAi.cache_tag)
+            if entry is not None and entry[1] is not None:
+                return entry[1]
+        if BotAi.EVALUATOR == "patterns":
+            value = patterns.evaluate(own, opp)
         else:
-            best_value = math.inf
-            available_moves = game.available_moves()
-            for move in available_moves:
-                game_bckp = deepcopy(game)
-                game.play(move)
-                value, _ = BotAi.minimax(game.board, depth - 1, game.current_player, original_player)
-                game = game_bckp # revert move
-                if value < best_value:
-                    best_value = value
-                    best_move = move
-            return best_value, best_move
+            value = BotAi.game_heuristic(game, color)
+        if cache is not None:
+            cache.store(own, opp, value=value, tag=BotAi.cache_tag)
+        return value
 
+    # reads the evaluation state that Game keeps up to date, so a leaf costs no board scan
     @staticmethod
-    def game_heuristic(board, player):
+    def game_heuristic(game: Game, player):
         # defining the ai and Opponent color
         my_color = player
         opp_color = Color.WHITE if player == Color.BLACK else Color.BLACK
-
-        my_tiles = 0
-        opp_tiles = 0
-        my_front_tiles = 0
-        opp_front_tiles = 0
+        board = game.board
 
         p = 0
         c = 0
@@ -284,46 +1244,23 @@ class BotAi:
         f = 0
         d = 0
 
-        # these two are used for going in every 8 directions
-        X1 = [-1, -1, 0, 1, 1, 1, 0, -1]
-        Y1 = [0, 1, 1, 1, 0, -1, -1, -1]
-
-        V = [
-            [20, -3, 11,  8,  8, 11, -3, 20],
-            [-3, -7, -4,  1,  1, -4, -7, -3],
-            [11, -4,  2,  2,  2,  2, -4, 11],
-            [8,   1,  2, -3, -3,  2,  1,  8],
-            [8,   1,  2, -3, -3,  2,  1,  8],
-            [11, -4,  2,  2,  2,  2, -4, 11],
-            [-3, -7, -4,  1,  1, -4, -7, -3],
-            [20, -3, 11,  8,  8, 11, -3, 20]
-        ]
+        if my_color == Color.BLACK:
+            my_tiles, opp_tiles = game.blacks, game.whites
+            my_front_tiles, opp_front_tiles = game.black_frontier, game.white_frontier
+            my_corners, opp_corners = game.black_corners, game.white_corners
+            my_mask, opp_mask = game.black_mask, game.white_mask
+            d = game.square_score
+        else:
+            my_tiles, opp_tiles = game.whites, game.blacks
+            my_front_tiles, opp_front_tiles = game.white_frontier, game.black_frontier
+            my_corners, opp_corners = game.white_corners, game.black_corners
+            my_mask, opp_mask = game.white_mask, game.black_mask
+            d = -game.square_score
 
-        # =============================================================================================
-        # 1- Piece difference, frontier disks and disk squares
-        # =============================================================================================
-        for i in range(8):
-            for j in range(8):
-                if board[Cord(i,j)] == my_color:
-                    d += V[i][j]
-                    my_tiles += 1
-                elif board[Cord(i,j)] == opp_color:
-                    d -= V[i][j]
-                    opp_tiles += 1
-
-                # calculates the number of blank spaces around me
-                # if the tile is not empty take a step in each direction
-                if board[Cord(i,j)] != Color.EMPTY:
-                    for k in range(8):
-                        x = i + X1[k]
-                        y = j + Y1[k]
-                        if (0 <= x < 8 and 0 <= y < 8 and
-                                board[Cord(i,j)] == Color.EMPTY):
-                            if board[Cord(i,j)] == my_color:
-                                my_front_tiles += 1
-                            else:
-                                opp_front_tiles += 1
-                            break
+        # the original frontier loop tested the tile itself instead of its neighbour,
+        # so the term was always zero
+        if not BotAi.FIX_FRONTIER:
+            my_front_tiles = opp_front_tiles = 0
 
         # =============================================================================================
         # 2 - calculates the difference between current colored tiles
@@ -347,30 +1284,8 @@ class BotAi:
 
         # ===============================================================================================
         # 4 - Corner occupancy
-        '''
-        Examine all 4 corners :
-        if they were my color add a point to me 
-        if they were enemies add a point to the enemy
-        '''
         # ===============================================================================================
-        my_tiles = opp_tiles = 0
-        if board[Cord(0,0)] == my_color:
-            my_tiles += 1
-        elif board[Cord(0,0)] == opp_color:
-            opp_tiles += 1
-        if board[Cord(0,7)] == my_color:
-            my_tiles += 1
-        elif board[Cord(0,7)] == opp_color:
-            opp_tiles += 1
-        if board[Cord(7,0)] == my_color:
-            my_tiles += 1
-        elif board[Cord(7,0)] == opp_color:
-            opp_tiles += 1
-        if board[Cord(7,7)] == my_color:
-            my_tiles += 1
-        elif board[Cord(7,7)] == opp_color:
-            opp_tiles += 1
-        c = 25 * (my_tiles - opp_tiles)
+        c = 25 * (my_corners - opp_corners)
 
         # ===============================================================================================
         # 5 - CORNER CLOSENESS
@@ -381,61 +1296,13 @@ class BotAi:
         '''
         # ===============================================================================================
         my_tiles = opp_tiles = 0
-        if board[Cord(0,0)] == Color.EMPTY:
-            if board[Cord(0,1)] == my_color:
-                my_tiles += 1
-            elif board[Cord(0,1)] == opp_color:
-                opp_tiles += 1
-            if board[Cord(1,1)]== my_color:
-                my_tiles += 1
-            elif board[Cord(1,1)] == opp_color:
-                opp_tiles += 1
-            if board[Cord(1,0)] == my_color:
-                my_tiles += 1
-            elif board[Cord(1,0)] == opp_color:
-                opp_tiles += 1
-
-        if board[Cord(0,7)] == ' ':
-            if board[Cord(0,6)] == my_color:
-                my_tiles += 1
-            elif board[Cord(0,6)] == opp_color:
-                opp_tiles += 1
-            if board[Cord(1,6)] == my_color:
-                my_tiles += 1
-            elif board[Cord(1, 6)] == opp_color:
-                opp_tiles += 1
-            if board[Cord(1, 7)] == my_color:
-                my_tiles += 1
-            elif board[Cord(1, 7)] == opp_color:
-                opp_tiles += 1
-
-        if board[Cord(7,0)] == ' ':
-            if board[Cord(7,1)] == my_color:
-                my_tiles += 1
-            elif board[Cord(7,1)] == opp_color:
-                opp_tiles += 1
-            if board[Cord(6,1)] == my_color:
-                my_tiles += 1
-            elif board[Cord(6,1)] == opp_color:
-                opp_tiles += 1
-            if board[Cord(6,0)] == my_color:
-                my_tiles += 1
-            elif board[Cord(6,0)] == opp_color:
-                opp_tiles += 1
-
-        if board[Cord(7,7)] == Color.EMPTY:
-            if board[Cord(6,7)] == my_color:
-                my_tiles += 1
-            elif board[Cord(6,7)] == opp_color:
-                opp_tiles += 1
-            if board[Cord(6,6)] == my_color:
-                my_tiles += 1
-            elif board[Cord(6,6)] == opp_color:
-                opp_tiles += 1
-            if board[Cord(7,6)] == my_color:
-                my_tiles += 1
-            elif board[Cord(7,6)] == opp_color:
-                opp_tiles += 1
+        for corner, adjacent in CORNER_REGIONS if BotAi.FIX_CORNER_CLOSENESS else LEGACY_CORNER_REGIONS:
+            if board[corner] == Color.EMPTY:
+                for field in adjacent:
+                    if board[field] == my_color:
+                        my_tiles += 1
+                    elif board[field] == opp_color:
+                        opp_tiles += 1
 
         l = -12.5 * (my_tiles - opp_tiles)
 
@@ -448,9 +1315,14 @@ class BotAi:
         with the intent of restricting the
         opponent’s mobility and increasing one’s own mobility
         '''
-        # basically it calculates the difference between available moves
-        my_tiles = len(BotAi.available_moves(board, my_color))
-        opp_tiles = len(BotAi.available_moves(board, opp_color))
+        # counted the way Game.available_moves lists them, once per flipped line;
+        # a side without moves used to be credited with its opponent's moves
+        my_tiles = bitboard.move_lines(my_mask, opp_mask)
+        opp_tiles = bitboard.move_lines(opp_mask, my_mask)
+        if not my_tiles:
+            my_tiles = opp_tiles
+        if not opp_tiles:
+            opp_tiles = my_tiles
 
         if my_tiles > opp_tiles:
             m = (100.0 * my_tiles) / (my_tiles + opp_tiles)
@@ -463,5 +1335,11 @@ class BotAi:
         # =============================================================================================
         # final weighted score
         # adding different weights to different evaluations
-        return (10 * p) + (801.724 * c) + (382.026 * l) + \
-               (78.922 * m) + (74.396 * f) + (10 * d)
+        wp, wc, wl, wm, wf, wd = TERM_WEIGHTS
+        return (wp * p) + (wc * c) + (wl * l) + \
+               (wm * m) + (wf * f) + (wd * d)
+
+
+# game.session calls the hook after every opponent move, so without pondering the bot leaves it out
+if not (BotAi.PONDER and botworker.hosted):
+    del bot_opponent_turn
@@ -0,0 +1,248 @@
+from color import Color
+from multiprocessing import RawArray, Process, Semaphore
+import bitboard
+import importlib
+import math
+import rules
+import struct
+import threading
+import time
+import traceback
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+"""
+Бот в отдельном долгоживущем процессе. Падение, утечка памяти или зависание бота не трогают
+процесс судьи: судья видит ошибочный ход, а процесс бота перезапускается.
+Доска и ответ передаются через небольшой буфер в разделяемой памяти (битовые маски),
+о запросе и ответе процессы сообщают друг другу семафорами
+"""
+
+# Запрос: номер, вид, цвет (Color.value), маска черных, маска белых, поле хода соперника
+REQUEST = struct.Struct("<IBBQQbb")
+# Ответ: номер запроса, состояние, поле (-1, -1 - нет поля)
+REPLY = struct.Struct("<IBbb")
+
+# Виды запросов
+HELLO = 1
+TURN = 2
+OPPONENT = 3
+STOP = 4
+
+# Состояния ответа
+OK = 0
+ERROR = 1
+
+# Как часто ожидающий ответа судья проверяет, жив ли процесс бота, в секундах
+POLL = 0.05
+# Время на запуск процесса и импорт бота
+START_TIMEOUT = 60.0
+# Время на ответ обработчика хода соперника, как game.NOTIFY_LIMIT
+NOTIFY_TIMEOUT = 0.1
+
+# Модуль бота импортирован процессом бота, а не процессом судьи
+hosted = False
+
+
+"""
+Ограничения процесса бота: адресное пространство в мегабайтах и процессорное время
+в секундах на каждый запрос (вместе с работой бота до следующего запроса). None - без ограничения
+"""
+
+
+class Limits:
+    def __init__(self, memory_mb: float = None, cpu_seconds: float = None):
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+
+    def is_limited(self) -> bool:
+        return self.memory_mb is not None or self.cpu_seconds is not None
+
+
+"""
+Применяет ограничения к текущему процессу. Нехватка памяти приходит боту как MemoryError
+"""
+
+
+def apply_limits(limits: Limits):
+    if limits.memory_mb is not None:
+        size = int(limits.memory_mb * 2 ** 20)
+        resource.setrlimit(resource.RLIMIT_AS, (size, size))
+    allow_cpu(limits)
+
+
+"""
+Отводит процессу limits.cpu_seconds процессорного времени сверх уже израсходованного:
+RLIMIT_CPU считает время с запуска процесса, поэтому мягкий предел сдвигается перед каждым
+запросом. Превысив его, процесс получает SIGXCPU и завершается
+"""
+
+
+def allow_cpu(limits: Limits):
+    if limits.cpu_seconds is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime + limits.cpu_seconds)
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+"""
+Цикл процесса бота: импортирует модуль name и отвечает на запросы, пока не получит STOP.
+Исключение бота становится ответом ERROR, процесс продолжает работу
+"""
+
+
+def serve(name: str, buffer, requests, replies, limits: Limits):
+    global hosted
+    hosted = True
+    apply_limits(limits)
+    bot = importlib.import_module(name)
+    listener = getattr(bot, "bot_opponent_turn", None)
+    while True:
+        requests.acquire()
+        number, kind, color, black, white, x, y = REQUEST.unpack_from(buffer, 0)
+        if kind == STOP:
+            return
+        allow_cpu(limits)
+        status, reply_x, reply_y = OK, -1, -1
+        try:
+            if kind == HELLO:
+                reply_x = int(listener is not None)
+            elif kind == TURN:
+                field = bot.bot_turn(bitboard.to_board(black, white), Color(color))
+                if field is not None:
+                    reply_x, reply_y = field
+                    # Ход вне доски сводится к пустому ответу, судья засчитает ошибку
+                    if not rules.check_field_validness((reply_x, reply_y)):
+                        reply_x = reply_y = -1
+            elif kind == OPPONENT:
+                listener(bitboard.to_board(black, white), Color(color), None if x < 0 else (x, y))
+        except Exception:
+            traceback.print_exc()
+            status = ERROR
+        REPLY.pack_into(buffer, REQUEST.size, number, status, reply_x, reply_y)
+        replies.release()
+
+
+"""
+Заместитель модуля бота для game.session: те же bot_turn и bot_opponent_turn, но бот работает
+в своем процессе. Запрос, оставшийся без ответа (судья перестал ждать по лимиту времени),
+или упавший процесс приводят к перезапуску; прерванный ход получает пустой ответ
+"""
+
+
+class BotProcess:
+    def __init__(self, name: str, limits: Limits = None):
+        if limits is None:
+            limits = Limits()
+        if limits.is_limited() and resource is None:
+            raise ImportError("Для ограничений памяти и процессора нужен модуль resource (POSIX)")
+        self.__name__ = name
+        self.limits = limits
+        self.buffer = RawArray("B", REQUEST.size + REPLY.size)
+        self.lock = threading.RLock()
+        self.number = 0
+        # Отправлен запрос, ответ на который еще не получен
+        self.busy = False
+        self.restarts = 0
+        self.process = None
+        self.start()
+
+    def start(self):
+        # Новые семафоры: в старых могли остаться сигналы неотвеченных запросов
+        self.requests = Semaphore(0)
+        self.replies = Semaphore(0)
+        self.process = Process(target=serve, args=(self.__name__, self.buffer, self.requests, self.replies,
+                                                   self.limits), daemon=True)
+        self.process.start()
+        self.busy = False
+        reply = self.exchange(HELLO, timeout=START_TIMEOUT)
+        if reply is None:
+            self.stop()
+            raise RuntimeError(f"Процесс бота {self.__name__} не запустился")
+        # game.session ищет обработчик у модуля бота, у заместителя его нет, если нет у бота
+        if not reply[1]:
+            self.bot_opponent_turn = None
+
+    def restart(self):
+        self.stop()
+        # Ожидающие ответа старого процесса (брошенные вызовы) видят новый номер и выходят
+        self.number += 1
+        self.restarts += 1
+        self.start()
+
+    def stop(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+    # Перезапускает процесс, если он упал или занят брошенным запросом
+    def recover(self):
+        with self.lock:
+            if self.busy or not self.process.is_alive():
+                self.restart()
+
+    def close(self):
+        with self.lock:
+            if self.process.is_alive() and not self.busy:
+                REQUEST.pack_into(self.buffer, 0, 0, STOP, 0, 0, 0, -1, -1)
+                self.requests.release()
+                self.process.join(POLL)
+            self.stop()
+
+    # Запрос к работающему процессу, перед ним - перезапуск упавшего или занятого
+    def call(self, kind: int, black: int = 0, white: int = 0, color: Color = Color.EMPTY, field=None,
+             timeout: float = None):
+        self.recover()
+        return self.exchange(kind, black, white, color, field, timeout)
+
+    # Отправляет запрос и ждет ответа. Возвращает (состояние, x, y) или None,
+    # если процесс упал, ответ не пришел за timeout или запрос заменен более новым
+    def exchange(self, kind: int, black: int = 0, white: int = 0, color: Color = Color.EMPTY, field=None,
+                 timeout: float = None):
+        x, y = (-1, -1) if field is None else field
+        with self.lock:
+            self.number += 1
+            number = self.number
+            replies = self.replies
+            REQUEST.pack_into(self.buffer, 0, number, kind, color.value, black, white, x, y)
+            self.busy = True
+            self.requests.release()
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            wait = POLL if deadline is None else max(0.0, min(POLL, deadline - time.perf_counter()))
+            if replies.acquire(timeout=wait):
+                reply_number, status, reply_x, reply_y = REPLY.unpack_from(self.buffer, REQUEST.size)
+                if reply_number == number:
+                    self.busy = False
+                    return status, reply_x, reply_y
+                # Запоздавший ответ на брошенный запрос
+                continue
+            if self.number != number or not self.process.is_alive():
+                return None
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+
+    def bot_turn(self, board: list[list[Color]], color: Color):
+        reply = self.call(TURN, *bitboard.from_board(board), color)
+        if reply is None or reply[0] != OK or reply[1] < 0:
+            return None
+        return reply[1], reply[2]
+
+    # Зависший обработчик не держит судью: через NOTIFY_TIMEOUT возвращается False, процесс,
+    # занятый брошенным запросом, перезапускается перед следующим запросом (recover)
+    def bot_opponent_turn(self, board: list[list[Color]], color: Color, field) -> bool:
+        reply = self.call(OPPONENT, *bitboard.from_board(board), color, field, NOTIFY_TIMEOUT)
+        return reply is not None
+
+    # Время пустого запроса туда и обратно, в секундах
+    def ping(self) -> float:
+        started = time.perf_counter()
+        self.call(HELLO)
+        return time.perf_counter() - started
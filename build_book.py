@@ -0,0 +1,58 @@
+import argparse
+import math
+import os
+from multiprocessing import Pool
+
+from book import write_book
+from bot_canary import BotAi, FormatConverter, Game
+
+
+# every position with the side to move having a move, up to plies moves from the start,
+# as {hash: (board, player)}
+def early_positions(plies):
+    positions = {}
+
+    def walk(game, depth):
+        if game.is_game_over() or game.hash in positions:
+            return
+        positions[game.hash] = (FormatConverter.game_to_ai_board(game.board), game.current_player)
+        if depth == plies:
+            return
+        for move in dict.fromkeys(game.available_moves()):
+            record = game.play(move, validate=False)
+            walk(game, depth + 1)
+            game.undo(record)
+
+    walk(Game(), 0)
+    return positions
+
+
+def search_position(task):
+    key, board, player, depth, time_budget = task
+    game = Game(FormatConverter.ai_to_game_board(board), player)
+    move = BotAi.get_next_move(game, player, time_budget, depth)
+    return key, (move.x, move.y), BotAi.last_search.depth
+
+
+def build(path, plies, depth, time_budget=math.inf, workers=None):
+    positions = early_positions(plies)
+    tasks = [(key, board, player, depth, time_budget) for key, (board, player) in positions.items()]
+    records = []
+    with Pool(processes=workers or os.cpu_count()) as pool:
+        for record in pool.imap_unordered(search_position, tasks, chunksize=16):
+            records.append(record)
+            print(f"\r{len(records)}/{len(tasks)}", end="", flush=True)
+    print()
+    return write_book(path, records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the opening book read by bot_canary")
+    parser.add_argument("path", nargs="?", default=BotAi.BOOK_PATH)
+    parser.add_argument("--plies", type=int, default=6, help="book depth in moves from the start")
+    parser.add_argument("--depth", type=int, default=8, help="search depth for every book position")
+    parser.add_argument("--time", type=float, default=math.inf, help="search seconds per position")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    count = build(args.path, args.plies, args.depth, args.time, args.workers)
+    print(f"{count} positions written to {args.path}")
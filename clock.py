@@ -0,0 +1,77 @@
+import threading
+import time
+
+"""
+Контроль времени партии: лимит на ход, запас на партию и добавка за каждый ход, в секундах.
+None - без ограничения
+"""
+
+
+class TimeControl:
+    def __init__(self, move_limit: float = None, game_limit: float = None, increment: float = 0.0):
+        self.move_limit = move_limit
+        self.game_limit = game_limit
+        self.increment = increment
+
+    def is_limited(self) -> bool:
+        return self.move_limit is not None or self.game_limit is not None
+
+
+"""
+Время, которое бот может потратить на текущий ход при оставшемся запасе remaining
+"""
+
+
+def allowed_time(time_control: TimeControl, remaining: float):
+    limits = [limit for limit in (time_control.move_limit, remaining) if limit is not None]
+    return min(limits) if limits else None
+
+
+"""
+Вызывает бота и возвращает (ответ, затраченное время, превышен ли лимит).
+При лимите бот работает в отдельном потоке: судья перестает ждать по истечении времени.
+Брошенный поток остановить нельзя, он продолжает работать в процессе судьи, поэтому
+tournament под контролем времени держит ботов в отдельных процессах (botworker)
+"""
+
+
+def timed_call(bot_turn, board, color, limit: float = None) -> tuple:
+    started = time.perf_counter()
+    if limit is None:
+        chosen_field = bot_turn(board, color)
+        return chosen_field, time.perf_counter() - started, False
+
+    reply = {}
+
+    def target():
+        try:
+            reply["field"] = bot_turn(board, color)
+        except BaseException as error:
+            reply["error"] = error
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(limit)
+    elapsed = time.perf_counter() - started
+    if thread.is_alive():
+        return None, elapsed, True
+    if "error" in reply:
+        raise reply["error"]
+    return reply["field"], elapsed, elapsed > limit
+
+
+"""
+Перцентили времени на ход
+"""
+
+
+def latency_summary(times: list[float]) -> dict:
+    if len(times) == 0:
+        return {"moves": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(times)
+
+    def percentile(share):
+        return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+    return {"moves": len(ordered), "p50": percentile(0.50), "p95": percentile(0.95),
+            "p99": percentile(0.99), "max": ordered[-1]}
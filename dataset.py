@@ -0,0 +1,124 @@
+from color import Color
+import bitboard
+import glob
+import os
+import protocol as events
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+Набор позиций из партий: каждая позиция, в которой оказалась партия в session, - запись
+фиксированной длины (маска черных, маска белых, цвет хода, сделанный ход, итог партии).
+Записи дописываются в файлы-шарды, читаются через np.memmap без загрузки в память
+"""
+
+# Маска черных, маска белых, цвет хода (Color.value), поле хода (-1 - пропуск или ошибка),
+# разница фишек черные - белые в конце партии; партия, проигранная за ошибку или время,
+# записывается как разгромная: ±FORFEIT в пользу соперника
+RECORD = struct.Struct("<QQBbb")
+
+FORFEIT = 64
+
+# Размер шарда, после которого процесс начинает следующий
+SHARD_BYTES = 1 << 30
+
+
+"""
+Дописывает партии в шарды каталога directory. У каждого процесса свои шарды,
+партия пишется одним вызовом write, поэтому шард всегда содержит целые партии
+"""
+
+
+class ShardWriter:
+    def __init__(self, directory: str, shard_bytes: int = SHARD_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_bytes = shard_bytes
+        self.shard = 0
+
+    def path(self) -> str:
+        return os.path.join(self.directory, f"positions-{os.getpid()}-{self.shard:04d}.bin")
+
+    def write(self, records: list[tuple]):
+        self.append(b"".join(RECORD.pack(*record) for record in records))
+
+    # records - структурированный массив NumPy с типом record_dtype()
+    def write_array(self, records):
+        self.append(records.tobytes())
+
+    def append(self, data: bytes):
+        while os.path.exists(self.path()) and os.path.getsize(self.path()) >= self.shard_bytes:
+            self.shard += 1
+        with open(self.path(), "ab") as file:
+            file.write(data)
+
+
+"""
+Приемник событий session, который восстанавливает позиции по ходам и
+в конце партии передает их writer вместе с итогом. board - начальная доска партии
+"""
+
+
+class PositionSink:
+    def __init__(self, writer: ShardWriter, board: list[list[Color]]):
+        self.writer = writer
+        self.black, self.white = bitboard.from_board(board)
+        self.positions = []
+
+    def append(self, event: tuple):
+        kind, ply, color, square, flips = event
+        if kind == events.MOVE:
+            self.positions.append((self.black, self.white, color.value, square))
+            own, opp = bitboard.split(self.black, self.white, color)
+            own, opp = own | flips | (1 << square), opp & ~flips
+            self.black, self.white = bitboard.split(own, opp, color)
+        elif kind == events.PASS:
+            self.positions.append((self.black, self.white, color.value, -1))
+        elif kind == events.ERROR or kind == events.TIMEOUT:
+            self.positions.append((self.black, self.white, color.value, -1))
+            # Фишки на момент ошибки не говорят об итоге: проигрывает нарушитель
+            self.finish(-FORFEIT if color == Color.BLACK else FORFEIT)
+        elif kind == events.END:
+            self.finish(bitboard.count(self.black) - bitboard.count(self.white))
+
+    def finish(self, diff: int):
+        self.writer.write([position + (diff,) for position in self.positions])
+        self.positions = []
+
+
+"""
+Тип записи для NumPy, совпадает с RECORD
+"""
+
+
+def record_dtype():
+    if np is None:
+        raise ImportError("Для чтения набора позиций нужен NumPy")
+    return np.dtype([("black", "<u8"), ("white", "<u8"), ("side", "u1"), ("move", "i1"), ("diff", "i1")])
+
+
+"""
+Шард как структурированный массив np.memmap только для чтения.
+Недописанная последняя запись (процесс прервали) не читается
+"""
+
+
+def open_shard(path: str):
+    dtype = record_dtype()
+    records = os.path.getsize(path) // dtype.itemsize
+    if records == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(records,))
+
+
+"""
+Все шарды каталога по порядку имен
+"""
+
+
+def open_dataset(directory: str) -> list:
+    return [open_shard(path) for path in sorted(glob.glob(os.path.join(directory, "positions-*.bin")))]
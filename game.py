@@ -1,16 +1,43 @@
 from color import Color
-from copy import deepcopy
 import rules
+import bitboard
+import protocol as events
+import botworker
+import clock
 
+# Время на обработчик хода соперника, в секундах
+NOTIFY_LIMIT = 0.1
 
-def session(board: list[list[Color]], first_bot, second_bot) -> dict:
+
+"""
+Проводит партию. details - приемник событий протокола (см. protocol.py), по умолчанию список.
+time_control - контроль времени (clock.TimeControl), по умолчанию без ограничений.
+Бот, превысивший время, проигрывает так же, как за недопустимый ход.
+Бот может объявить bot_opponent_turn(board, color, field): после каждого хода соперника
+он получает доску, свой цвет и поле хода (None - пропуск). Обработчик должен возвращаться
+сразу: под контролем времени дольше NOTIFY_LIMIT - проигрыш по времени. Процесс бота
+(botworker.BotProcess) ограничивает обработчик сам и вызывается напрямую. Если вызов бота
+брошен по лимиту, его имя записывается в protocol["abandoned"]
+"""
+
+
+def session(board: list[list[Color]], first_bot, second_bot, details=None, time_control=None) -> dict:
     protocol = {
         "first bot": first_bot.__name__,
         "second bot": second_bot.__name__,
-        "details": []
+        "details": [] if details is None else details,
+        # Время на каждый ход первого и второго бота, в секундах
+        "think times": ([], [])
     }
+    if time_control is None:
+        time_control = clock.TimeControl()
+    # Оставшийся запас времени на партию у каждого бота
+    remaining = [time_control.game_limit, time_control.game_limit]
 
-    name_deque = [first_bot.__name__, second_bot.__name__]
+    listeners = [getattr(first_bot, "bot_opponent_turn", None), getattr(second_bot, "bot_opponent_turn", None)]
+    # Без контроля времени обработчик вызывается напрямую, без потока на каждый полуход
+    notify_limits = [NOTIFY_LIMIT if time_control.is_limited() and not isinstance(bot, botworker.BotProcess)
+                     else None for bot in (first_bot, second_bot)]
     first_bot = first_bot.bot_turn
     second_bot = second_bot.bot_turn
     turn_deque = [first_bot, second_bot]
@@ -18,58 +45,116 @@ def session(board: list[list[Color]], first_bot, second_bot) -> dict:
     turn_index = 0
 
     first_stopped = False
+    # Номер полухода, пропуски хода тоже считаются
+    ply = 0
+
+    # Позиция ведется параллельно в битовом виде, доска для ботов обновляется по маскам
+    black, white = bitboard.from_board(board)
 
     while True:
         current_bot = turn_deque[turn_index]
         current_color = color_deque[turn_index]
 
-        fields = rules.available_fields(board, current_color)
+        own, opp = bitboard.split(black, white, current_color)
+        fields = bitboard.fields(bitboard.moves(own, opp))
         # Отсутствие доступных ходов у бота
         if len(fields) == 0:
-            protocol["details"].append(f"Бот {name_deque[turn_index]} не может выполнить ход")
+            protocol["details"].append((events.PASS, ply, current_color, None, 0))
+            ply += 1
+            if not notify(listeners[(turn_index + 1) % 2], board, color_deque[(turn_index + 1) % 2], None,
+                          notify_limits[(turn_index + 1) % 2]):
+                return forfeit(protocol, (turn_index + 1) % 2, events.TIMEOUT, ply, None, black, white)
             # Его оппонент перед этим был в такой же ситуации
             if not first_stopped:
                 first_stopped = True
                 turn_index = (turn_index + 1) % 2
                 continue
             else:
-                protocol["details"].append("Оба бота не могут выполнить ход")
-                protocol["details"].append("Игра окончена")
+                protocol["details"].append((events.END, ply, None, None, 0))
                 break
 
-        old_board = deepcopy(board)
-        chosen_field = current_bot(board, current_color)
-        print("({}, {})".format(chosen_field[0], chosen_field[1]))
-        if chosen_field is not None:
-            protocol["details"].append(
-                f"Бот {name_deque[turn_index]} выполняет ход {chosen_field} цветом {current_color}")
-        else:
-            protocol["details"].append(f"Бот {name_deque[turn_index]} не выполнил ход")
+        # Бот получает свою копию доски, изменение копии сверяется с битовыми масками
+        # и засчитывается как ошибка; доска судьи боту недоступна
+        view = bitboard.to_board(black, white)
+        limit = clock.allowed_time(time_control, remaining[turn_index])
+        chosen_field, elapsed, overrun = clock.timed_call(current_bot, view, current_color, limit)
+        tampered = bitboard.from_board(view) != (black, white)
+        protocol["think times"][turn_index].append(elapsed)
+        if remaining[turn_index] is not None:
+            remaining[turn_index] += time_control.increment - elapsed
 
-        if rules.board_diff(old_board, board) or not rules.check_field_validness(chosen_field) \
+        if overrun or tampered or not rules.check_field_validness(chosen_field) \
                 or (chosen_field is None and len(fields) != 0) or not rules.turn_validness(chosen_field, fields):
-            protocol["details"].append(f"Бот {name_deque[turn_index]} совершил ошибку")
-            protocol["details"].append("Игра окончена")
-            turn_index = (turn_index + 1) % 2
-            winner = protocol["first bot"] if turn_index == 0 else protocol["second bot"]
-            protocol["winner"] = winner
-            return protocol
+            protocol["error move"] = chosen_field
+            error_square = None
+            if chosen_field is not None and rules.check_field_validness(chosen_field):
+                error_square = bitboard.square(chosen_field)
+            error_kind = events.TIMEOUT if overrun else events.ERROR
+            return forfeit(protocol, turn_index, error_kind, ply, error_square, black, white)
 
         board[chosen_field[0]][chosen_field[1]] = current_color
 
-        rules.redraw(board, chosen_field, current_color, protocol)
+        chosen_square = bitboard.square(chosen_field)
+        flipped = bitboard.flips(own, opp, chosen_square)
+        own, opp = own | flipped | (1 << chosen_square), opp & ~flipped
+        black, white = bitboard.split(own, opp, current_color)
+        rules.recolor(board, flipped, current_color)
+        protocol["details"].append((events.MOVE, ply, current_color, chosen_square, flipped))
+        ply += 1
+        if not notify(listeners[(turn_index + 1) % 2], board, color_deque[(turn_index + 1) % 2], chosen_field,
+                      notify_limits[(turn_index + 1) % 2]):
+            return forfeit(protocol, (turn_index + 1) % 2, events.TIMEOUT, ply, None, black, white)
 
         turn_index = (turn_index + 1) % 2
 
         first_stopped = False
 
-    color_counts = rules.count_fields(board)
+    black_count, white_count = bitboard.count(black), bitboard.count(white)
     winner = "draw"
-    protocol["details"].append(
-        f"Было закрашено {color_counts[Color.BLACK]} полей черным цветом, {color_counts[Color.WHITE]} полей белым цветом")
-    if color_counts[Color.BLACK] > color_counts[Color.WHITE]:
+    # Итог для первого бота: 1 - победа, 0 - ничья, -1 - поражение
+    protocol["result"] = 0
+    if black_count > white_count:
         winner = protocol["first bot"]
-    if color_counts[Color.BLACK] < color_counts[Color.WHITE]:
+        protocol["result"] = 1
+    if black_count < white_count:
         winner = protocol["second bot"]
+        protocol["result"] = -1
     protocol["winner"] = winner
+    protocol["discs"] = (black_count, white_count)
+    return protocol
+
+
+"""
+Сообщает боту о ходе соперника, если у бота есть обработчик. Бот получает копию доски.
+Возвращает False, если обработчик не уложился в limit (None - без ограничения) или
+вернул False (так процесс бота сообщает, что не дождался ответа)
+"""
+
+
+def notify(listener, board: list[list[Color]], color, field, limit: float = None) -> bool:
+    if listener is None:
+        return True
+    if limit is None:
+        return listener([row[:] for row in board], color, field) is not False
+
+    def call(view, own_color):
+        listener(view, own_color, field)
+        return True
+
+    _, _, overrun = clock.timed_call(call, [row[:] for row in board], color, limit)
+    return not overrun
+
+
+"""
+Заканчивает партию проигрышем бота loser (0 - первый, 1 - второй) за ошибку или время
+"""
+
+
+def forfeit(protocol: dict, loser: int, kind, ply: int, square, black: int, white: int) -> dict:
+    protocol["details"].append((kind, ply, Color.BLACK if loser == 0 else Color.WHITE, square, 0))
+    if kind == events.TIMEOUT:
+        protocol["abandoned"] = protocol["first bot"] if loser == 0 else protocol["second bot"]
+    protocol["winner"] = protocol["second bot"] if loser == 0 else protocol["first bot"]
+    protocol["result"] = -1 if loser == 0 else 1
+    protocol["discs"] = (bitboard.count(black), bitboard.count(white))
     return protocol
@@ -1,26 +1,54 @@
-from game import session
-from color import Color
-import importlib
-import pkgutil
-import random
+from botworker import Limits
+from clock import TimeControl
+from tournament import discover_bots, make_openings, match, run
+import argparse
+import sprt
 
-discovered_bots = [
-    (owner, importlib.import_module(owner))
-    for finder, owner, ispkg
-    in pkgutil.iter_modules()
-    if owner.startswith('bot_')
-]
+# Дебютов матча по умолчанию: с одной начальной позиции детерминированные боты играют
+# все пары одинаково
+MATCH_OPENINGS = 500
 
-random.shuffle(discovered_bots)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Турнир ботов: каждая упорядоченная пара играет заданное число партий")
+    parser.add_argument("--games", type=int, default=1, help="партий на каждую пару")
+    parser.add_argument("--openings", type=int, default=None,
+                        help=f"число случайных дебютов, по умолчанию 0, для --match {MATCH_OPENINGS}")
+    parser.add_argument("--opening-plies", type=int, default=4, help="ходов в дебюте")
+    parser.add_argument("--seed", type=int, default=None, help="зерно генератора дебютов")
+    parser.add_argument("--workers", type=int, default=None, help="процессов, по умолчанию по числу ядер")
+    parser.add_argument("--log-dir", default=None, help="каталог для протоколов партий в JSONL")
+    parser.add_argument("--dataset-dir", default=None, help="каталог для шардов набора позиций")
+    parser.add_argument("--cache-mb", type=float, default=None, help="мегабайт общего кэша позиций")
+    parser.add_argument("--isolate", action="store_true", help="каждый бот в своем долгоживущем процессе")
+    parser.add_argument("--bot-memory-mb", type=float, default=None,
+                        help="предел адресного пространства процесса бота, включает --isolate")
+    parser.add_argument("--bot-cpu-seconds", type=float, default=None,
+                        help="предел процессорного времени процесса бота на запрос, включает --isolate")
+    parser.add_argument("--match", nargs=2, metavar=("CANDIDATE", "BASELINE"), default=None,
+                        help="матч двух ботов парами партий с последовательным тестом вместо турнира")
+    parser.add_argument("--elo0", type=float, default=0.0, help="Elo кандидата по гипотезе H0")
+    parser.add_argument("--elo1", type=float, default=5.0, help="Elo кандидата по гипотезе H1")
+    parser.add_argument("--alpha", type=float, default=0.05, help="вероятность ошибочно принять H1")
+    parser.add_argument("--beta", type=float, default=0.05, help="вероятность ошибочно принять H0")
+    parser.add_argument("--max-games", type=int, default=20000, help="наибольшее число партий матча")
+    parser.add_argument("--move-time", type=float, default=None, help="секунд на ход")
+    parser.add_argument("--game-time", type=float, default=None, help="секунд на партию")
+    parser.add_argument("--increment", type=float, default=0.0, help="добавка секунд за каждый ход")
+    args = parser.parse_args()
 
-for k in range(0, len(discovered_bots) // 1 * 1, 1):
-    board = [[Color.EMPTY for j in range(8)] for i in range(8)]
-    board[3][4] = Color.BLACK
-    board[4][3] = Color.BLACK
-    board[3][3] = Color.WHITE
-    board[4][4] = Color.WHITE
-    print(discovered_bots[k][1].__name__, "vs", discovered_bots[k][1].__name__)
-    result = session(board, discovered_bots[k][1], discovered_bots[k][1])
-    summary = "\n".join(result["details"])
-    print(summary)
-    print("Победитель", result["winner"])
\ No newline at end of file
+    time_control = TimeControl(args.move_time, args.game_time, args.increment)
+    if args.openings is None:
+        args.openings = 0 if args.match is None else MATCH_OPENINGS
+    openings = make_openings(args.openings, args.opening_plies, args.seed)
+    isolation = Limits(args.bot_memory_mb, args.bot_cpu_seconds)
+    if not args.isolate and not isolation.is_limited():
+        isolation = None
+    if args.match is not None:
+        candidate, baseline = args.match
+        match(candidate, baseline, sprt.Sprt(args.elo0, args.elo1, args.alpha, args.beta), openings,
+              args.max_games, args.workers, args.log_dir, time_control, args.dataset_dir, isolation)
+    else:
+        bots = discover_bots()
+        print("Боты:", ", ".join(bots))
+        run(bots, args.games, openings, args.workers, args.log_dir, time_control, args.dataset_dir, args.cache_mb,
+            isolation)
@@ -0,0 +1,148 @@
+import os
+from array import array
+
+import bitboard
+import weights
+
+# ===================================================================================
+# Pattern evaluation
+# ===================================================================================
+# An alternative to game_heuristic. The squares of every edge, 3x3 corner region and long
+# diagonal are read as a base-3 number (0 empty, 1 own disc, 2 opponent disc) that indexes
+# a score table shared by all patterns of that kind. Squares are listed from the corner,
+# so one table serves every orientation. An index is summed from per-row lookups: for
+# each row a pattern touches, a 256-entry list maps the row's byte of the own mask to its
+# part of the index (the opponent's byte counts twice).
+# The tables are built from the game_heuristic ideas at import, or read from PATH.
+
+EDGES = [
+    [(0, j) for j in range(8)],
+    [(7, j) for j in range(8)],
+    [(i, 0) for i in range(8)],
+    [(i, 7) for i in range(8)],
+]
+CORNER_REGIONS = [[(ci + di * a, cj + dj * b) for a in range(3) for b in range(3)]
+                  for ci, cj, di, dj in [(0, 0, 1, 1), (0, 7, 1, -1), (7, 0, -1, 1), (7, 7, -1, -1)]]
+DIAGONALS = [
+    [(k, k) for k in range(8)],
+    [(k, 7 - k) for k in range(8)],
+]
+
+# the game_heuristic term weights and piece-square table, tuned ones when weights.json has them
+WEIGHTS = weights.load()
+# scale of game_heuristic: corner and corner-closeness weights times their per-square points
+CORNER = WEIGHTS["c"] * 25
+CLOSENESS = WEIGHTS["l"] * 12.5
+# every disc of an edge run that starts in an occupied corner can never be flipped
+STABLE = 400.0
+MOBILITY = WEIGHTS["m"]
+PARITY = WEIGHTS["p"]
+SQUARE = WEIGHTS["d"]
+
+V = WEIGHTS["V"]
+
+PATH = os.environ.get("REVERSI_PATTERNS",
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), "patterns.bin"))
+
+
+# owner of each square of a pattern configuration: +1 own, -1 opponent, 0 empty
+def signs(index, length):
+    result = []
+    for _ in range(length):
+        index, digit = divmod(index, 3)
+        result.append((0, 1, -1)[digit])
+    return result
+
+
+# an edge scores its middle squares by V and the discs anchored to an occupied corner
+def edge_score(cells):
+    score = sum(SQUARE * V[0][j] * cells[j] for j in range(3, 5))
+    for line in (cells, cells[::-1]):
+        owner = line[0]
+        run = 0
+        while owner and run < 8 and line[run] == owner:
+            run += 1
+        # the corner itself is scored by the corner region
+        score += STABLE * owner * max(0, run - 1)
+        # a full run was counted from both corners
+        if run == 8:
+            break
+    return score
+
+
+# a corner region scores its squares by V, the corner, and discs next to an empty corner
+def corner_score(cells):
+    score = sum(SQUARE * V[a][b] * cells[a * 3 + b] for a in range(3) for b in range(3))
+    score += CORNER * cells[0]
+    if not cells[0]:
+        score -= CLOSENESS * (cells[1] + cells[3] + cells[4])
+    return score
+
+
+# a diagonal scores the centre squares that no corner region covers
+def diagonal_score(cells):
+    return sum(SQUARE * V[k][k] * cells[k] for k in range(3, 5))
+
+
+KINDS = [(EDGES, edge_score), (CORNER_REGIONS, corner_score), (DIAGONALS, diagonal_score)]
+
+
+def build_tables():
+    return [array("d", (score(signs(index, len(patterns[0]))) for index in range(3 ** len(patterns[0]))))
+            for patterns, score in KINDS]
+
+
+def save_tables(path, tables):
+    with open(path, "wb") as file:
+        for table in tables:
+            table.tofile(file)
+
+
+def load_tables(path):
+    tables = []
+    with open(path, "rb") as file:
+        for patterns, _ in KINDS:
+            table = array("d")
+            table.fromfile(file, 3 ** len(patterns[0]))
+            tables.append(table)
+    return tables
+
+
+# (row, 256 index parts) for every row the pattern touches
+def row_parts(squares):
+    parts = []
+    for row in sorted({i for i, j in squares}):
+        digits = [0] * 256
+        for byte in range(256):
+            for k, (i, j) in enumerate(squares):
+                if i == row and byte >> j & 1:
+                    digits[byte] += 3 ** k
+        parts.append((row, digits))
+    return parts
+
+
+TABLES = load_tables(PATH) if os.path.exists(PATH) else build_tables()
+PATTERNS = [(table, row_parts(squares)) for (patterns, _), table in zip(KINDS, TABLES) for squares in patterns]
+
+
+# score of the position for the owner of own
+def evaluate(own, opp):
+    own_rows = own.to_bytes(8, "little")
+    opp_rows = opp.to_bytes(8, "little")
+    score = 0.0
+    for table, parts in PATTERNS:
+        index = 0
+        for row, digits in parts:
+            index += digits[own_rows[row]] + 2 * digits[opp_rows[row]]
+        score += table[index]
+
+    my_moves = bitboard.moves(own, opp).bit_count()
+    opp_moves = bitboard.moves(opp, own).bit_count()
+    if my_moves + opp_moves:
+        score += MOBILITY * 100.0 * (my_moves - opp_moves) / (my_moves + opp_moves)
+    return score + PARITY * (own.bit_count() - opp.bit_count())
+
+
+if __name__ == "__main__":
+    save_tables(PATH, build_tables())
+    print(f"pattern tables written to {PATH}")
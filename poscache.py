@@ -0,0 +1,214 @@
+from multiprocessing import shared_memory
+import multiprocessing
+import bitboard
+import os
+import struct
+import sys
+
+"""
+Кэш позиций с ключом по канонической форме позиции среди 8 симметрий доски
+(bitboard.canonical): повернутые и отраженные позиции попадают в одну запись.
+Запись хранит маску допустимых ходов, оценку позиции и лучший ход с глубиной поиска;
+оценка и ход относятся к тегу - настройке оценки, которая их посчитала.
+Таблица лежит в одном буфере: bytearray внутри процесса или разделяемая память,
+к которой подключаются все процессы турнира
+"""
+
+# Заголовок: метка формата, число корзин, попадания, промахи
+HEADER = struct.Struct("<QQQQ")
+MAGIC = 0x5245564552534931
+
+# Запись: свои, чужие (канонические), ходы, оценка, контрольная сумма, тег, лучший ход,
+# глубина, флаги, бит обращения для вытеснения
+SLOT = struct.Struct("<QQQdQIbBBB")
+# Записей в корзине: новая запись вытесняет по часовому алгоритму одну из них
+WAYS = 4
+
+HAS_MOVES = 1
+HAS_VALUE = 2
+HAS_BEST = 4
+
+# Через сколько обращений процесс переносит свои счетчики в общий заголовок
+FLUSH_EVERY = 1024
+
+# Имя разделяемой памяти для процессов турнира
+ENV_NAME = "REVERSI_CACHE"
+
+
+"""
+Контрольная сумма записи: запись, которую одновременно переписывал другой процесс,
+не совпадет с ней и будет считаться промахом
+"""
+
+
+def checksum(own: int, opp: int, moves: int, value: float, tag: int, best: int, depth: int, flags: int) -> int:
+    value_bits = struct.unpack("<Q", struct.pack("<d", value))[0]
+    return own ^ opp ^ moves ^ value_bits ^ (tag << 24) ^ ((best & 0xFF) | depth << 8 | flags << 16)
+
+
+class PositionCache:
+    def __init__(self, buffer, create: bool = True):
+        self.buffer = buffer
+        if create:
+            buckets = 1 << max(0, ((len(buffer) - HEADER.size) // (SLOT.size * WAYS)).bit_length() - 1)
+            buffer[:HEADER.size + buckets * WAYS * SLOT.size] = bytes(HEADER.size + buckets * WAYS * SLOT.size)
+            HEADER.pack_into(buffer, 0, MAGIC, buckets, 0, 0)
+        magic, buckets, _, _ = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Буфер не содержит кэш позиций")
+        self.mask = buckets - 1
+        # Счетчики этого процесса и еще не перенесенная в заголовок часть
+        self.hits = self.misses = 0
+        self.pending_hits = self.pending_misses = 0
+
+    # Кэш внутри процесса размером megabytes
+    @staticmethod
+    def local(megabytes: float):
+        return PositionCache(bytearray(int(megabytes * 2 ** 20)))
+
+    def bucket(self, own: int, opp: int) -> int:
+        key = (own * 0x9E3779B97F4A7C15 ^ opp * 0xC2B2AE3D27D4EB4F) & bitboard.FULL
+        return HEADER.size + ((key >> 20) & self.mask) * WAYS * SLOT.size
+
+    def find(self, own: int, opp: int):
+        base = self.bucket(own, opp)
+        for way in range(WAYS):
+            offset = base + way * SLOT.size
+            slot = SLOT.unpack_from(self.buffer, offset)
+            if slot[0] == own and slot[1] == opp and slot[8] \
+                    and slot[4] == checksum(own, opp, slot[2], slot[3], slot[5], slot[6], slot[7], slot[8]):
+                return offset, slot
+        return None, None
+
+    # Запись для позиции (own - фишки того, кто ходит) или None. Возвращает
+    # (маска ходов или None, оценка или None, лучший ход (номер бита) или None, глубина);
+    # оценка и ход - только с тем же тегом
+    def lookup(self, own: int, opp: int, tag: int = 0):
+        own_c, opp_c, symmetry = bitboard.canonical(own, opp)
+        offset, slot = self.find(own_c, opp_c)
+        if slot is None:
+            self.count(False)
+            return None
+        self.count(True)
+        if not slot[9]:
+            struct.pack_into("<B", self.buffer, offset + SLOT.size - 1, 1)
+        _, _, moves, value, _, slot_tag, best, depth, flags, _ = slot
+        same = slot_tag == tag
+        return (bitboard.restore(moves, symmetry) if flags & HAS_MOVES else None,
+                value if flags & HAS_VALUE and same else None,
+                bitboard.restore(1 << best, symmetry).bit_length() - 1 if flags & HAS_BEST and same else None,
+                depth if same else 0)
+
+    # Дополняет запись позиции: переданные поля заменяются, остальные сохраняются
+    # (оценка и ход с другим тегом сбрасываются, если переданы новые)
+    def store(self, own: int, opp: int, moves: int = None, value: float = None, best: int = None,
+              depth: int = 0, tag: int = 0):
+        own_c, opp_c, symmetry = bitboard.canonical(own, opp)
+        offset, slot = self.find(own_c, opp_c)
+        if slot is None:
+            offset = self.victim(self.bucket(own_c, opp_c))
+            slot = (own_c, opp_c, 0, 0.0, 0, tag, -1, 0, 0, 0)
+        _, _, old_moves, old_value, _, old_tag, old_best, old_depth, flags, _ = slot
+        if old_tag != tag:
+            # Запись одних ходов (rules.available_fields) не трогает оценку и ход под чужим тегом
+            if value is None and best is None:
+                tag = old_tag
+            else:
+                flags &= HAS_MOVES
+                old_value, old_best, old_depth = 0.0, -1, 0
+        if moves is not None:
+            old_moves = bitboard.transform(moves, symmetry)
+            flags |= HAS_MOVES
+        if value is not None:
+            old_value = value
+            flags |= HAS_VALUE
+        if best is not None:
+            old_best = bitboard.transform(1 << best, symmetry).bit_length() - 1
+            old_depth = depth
+            flags |= HAS_BEST
+        SLOT.pack_into(self.buffer, offset, own_c, opp_c, old_moves, old_value,
+                       checksum(own_c, opp_c, old_moves, old_value, tag, old_best, old_depth, flags),
+                       tag, old_best, old_depth, flags, 1)
+
+    # Место для новой записи в корзине: пустое, иначе первое без бита обращения;
+    # пройденные записи теряют бит, так что вытесняется давно не читанная
+    def victim(self, base: int) -> int:
+        for sweep in range(2):
+            for way in range(WAYS):
+                offset = base + way * SLOT.size
+                slot = SLOT.unpack_from(self.buffer, offset)
+                if not slot[8] or not slot[9]:
+                    return offset
+                struct.pack_into("<B", self.buffer, offset + SLOT.size - 1, 0)
+        return base
+
+    def count(self, hit: bool):
+        if hit:
+            self.hits += 1
+            self.pending_hits += 1
+        else:
+            self.misses += 1
+            self.pending_misses += 1
+        if self.pending_hits + self.pending_misses >= FLUSH_EVERY:
+            self.flush()
+
+    # Переносит счетчики процесса в общий заголовок. Процессы делают это без блокировки,
+    # поэтому общий счет приблизительный
+    def flush(self):
+        magic, buckets, hits, misses = HEADER.unpack_from(self.buffer, 0)
+        HEADER.pack_into(self.buffer, 0, magic, buckets, hits + self.pending_hits, misses + self.pending_misses)
+        self.pending_hits = self.pending_misses = 0
+
+    # Емкость, попадания, промахи и доля попаданий: по всем процессам из заголовка
+    def stats(self) -> dict:
+        _, buckets, hits, misses = HEADER.unpack_from(self.buffer, 0)
+        hits += self.pending_hits
+        misses += self.pending_misses
+        lookups = hits + misses
+        return {"capacity": buckets * WAYS, "hits": hits, "misses": misses,
+                "hit rate": hits / lookups if lookups else 0.0}
+
+
+"""
+Создает кэш в разделяемой памяти. Возвращает кэш и объект SharedMemory,
+который создатель закрывает и удаляет после работы
+"""
+
+
+def create_shared(megabytes: float):
+    memory = shared_memory.SharedMemory(create=True, size=int(megabytes * 2 ** 20))
+    return PositionCache(memory.buf), memory
+
+
+"""
+Подключается к кэшу в разделяемой памяти по имени
+"""
+
+
+def attach(name: str):
+    if sys.version_info >= (3, 13):
+        memory = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        memory = shared_memory.SharedMemory(name=name)
+        # Рабочие процессы делят трекер ресурсов с создателем кэша, а отдельный процесс
+        # со своим трекером иначе удалит чужую память при выходе
+        if multiprocessing.parent_process() is None:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(memory._name, "shared_memory")
+    return PositionCache(memory.buf, create=False), memory
+
+
+_default = None
+
+
+"""
+Кэш процесса: разделяемый, если задана переменная окружения REVERSI_CACHE, иначе None
+"""
+
+
+def default():
+    global _default
+    if _default is None:
+        name = os.environ.get(ENV_NAME)
+        _default = attach(name) if name else False
+    return _default[0] if _default else None
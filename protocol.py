@@ -0,0 +1,122 @@
+from color import Color
+import bitboard
+import json
+import struct
+
+"""
+Структурированный протокол партии. Session складывает в protocol["details"] события
+(вид, номер полухода, цвет, поле, маска перекрашенных полей), а текст строится
+только по запросу функцией render. Приемником событий может быть список, файл JSONL,
+двоичный файл, набор позиций (dataset.PositionSink) или NullSink, который их отбрасывает
+"""
+
+# Ход в поле square, перекрашены поля маски flips
+MOVE = 0
+# У бота нет доступных ходов
+PASS = 1
+# Оба бота не могут ходить, партия окончена
+END = 2
+# Бот совершил ошибку, партия окончена; сам ответ бота - в protocol["error move"]
+ERROR = 3
+# Бот превысил время на ход или на партию, партия окончена
+TIMEOUT = 4
+
+KIND_NAMES = {MOVE: "move", PASS: "pass", END: "end", ERROR: "error", TIMEOUT: "timeout"}
+
+# Номер игры, полуход, вид события, цвет (0 - нет), поле (-1 - нет), маска перекрашенных полей
+BINARY_EVENT = struct.Struct("<IHBBbQ")
+
+
+"""
+Приемник, который ничего не хранит
+"""
+
+
+class NullSink:
+    def append(self, event: tuple):
+        pass
+
+
+"""
+Передает каждое событие всем приемникам sinks по очереди
+"""
+
+
+class TeeSink:
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def append(self, event: tuple):
+        for sink in self.sinks:
+            sink.append(event)
+
+
+"""
+Пишет события строками JSON в открытый файл, буферизация - на стороне файла
+"""
+
+
+class JsonlSink:
+    def __init__(self, file, game: int = 0):
+        self.file = file
+        self.game = game
+
+    def append(self, event: tuple):
+        kind, ply, color, square, flips = event
+        self.file.write(json.dumps({
+            "game": self.game,
+            "ply": ply,
+            "event": KIND_NAMES[kind],
+            "color": color.name if color is not None else None,
+            "square": square,
+            "flips": flips}) + "\n")
+
+
+"""
+Пишет события записями фиксированной длины BINARY_EVENT в открытый двоичный файл
+"""
+
+
+class BinarySink:
+    def __init__(self, file, game: int = 0):
+        self.file = file
+        self.game = game
+
+    def append(self, event: tuple):
+        kind, ply, color, square, flips = event
+        self.file.write(BINARY_EVENT.pack(self.game, ply, kind, color.value if color is not None else 0,
+                                          -1 if square is None else square, flips))
+
+
+"""
+Текст протокола в прежнем виде, по событиям из списка protocol["details"]
+"""
+
+
+def render(protocol: dict) -> list[str]:
+    names = {Color.BLACK: protocol["first bot"], Color.WHITE: protocol["second bot"]}
+    lines = []
+    for kind, ply, color, square, flips in protocol["details"]:
+        if kind == MOVE:
+            enemy_color = Color.BLACK if color is Color.WHITE else Color.WHITE
+            lines.append(f"Бот {names[color]} выполняет ход {divmod(square, 8)} цветом {color}")
+            lines.append(f"Поля {bitboard.fields(flips)} перекрашены из {enemy_color} в {color}")
+        elif kind == PASS:
+            lines.append(f"Бот {names[color]} не может выполнить ход")
+        elif kind == END:
+            black_count, white_count = protocol["discs"]
+            lines.append("Оба бота не могут выполнить ход")
+            lines.append("Игра окончена")
+            lines.append(f"Было закрашено {black_count} полей черным цветом, {white_count} полей белым цветом")
+        elif kind == ERROR:
+            chosen_field = protocol.get("error move")
+            if chosen_field is not None:
+                lines.append(f"Бот {names[color]} выполняет ход {chosen_field} цветом {color}")
+            else:
+                lines.append(f"Бот {names[color]} не выполнил ход")
+            lines.append(f"Бот {names[color]} совершил ошибку")
+            lines.append("Игра окончена")
+        elif kind == TIMEOUT:
+            lines.append(f"Бот {names[color]} превысил время на ход")
+            lines.append("Игра окончена")
+    return lines
@@ -1,4 +1,6 @@
 from color import Color
+import bitboard
+import poscache
 
 """
 Определяет наличие изменений, сделанных на доске ботом
@@ -46,22 +48,22 @@ def check_field_validness(field: tuple[int, int]) -> bool:
 
 
 """
-Возвращает список координат, куда можно поставить фишку выбранного цвета
+Возвращает список координат, куда можно поставить фишку выбранного цвета.
+При включенном кэше позиций (poscache) ходы берутся из него
 """
 
 
 def available_fields(board: list[list[Color]], current_color) -> list[tuple[int, int]]:
-    result = []
-    player_fields = color_fields(board, current_color)
-    enemy_color = Color.BLACK if current_color is Color.WHITE else Color.WHITE
-    for field in player_fields:
-        for direction in [(-1, -1), (-1, 0), (0, -1), (1, -1), (-1, 1), (0, 1), (1, 0), (1, 1)]:
-            current_field = (field[0] + direction[0], field[1] + direction[1])
-            while check_field_validness(current_field) and board[current_field[0]][current_field[1]] is enemy_color:
-                current_field = (current_field[0] + direction[0], current_field[1] + direction[1])
-                if check_field_validness(current_field) and board[current_field[0]][current_field[1]] is Color.EMPTY:
-                    result.append(current_field)
-    return result
+    own, opp = bitboard.split(*bitboard.from_board(board), current_color)
+    cache = poscache.default()
+    if cache is None:
+        return bitboard.fields(bitboard.moves(own, opp))
+    entry = cache.lookup(own, opp)
+    if entry is not None and entry[0] is not None:
+        return bitboard.fields(entry[0])
+    moves = bitboard.moves(own, opp)
+    cache.store(own, opp, moves=moves)
+    return bitboard.fields(moves)
 
 
 """
@@ -71,25 +73,21 @@ def available_fields(board: list[list[Color]], current_color) -> list[tuple[int,
 
 def redraw(board: list[list[Color]], chosen_field: tuple[int, int], current_color: Color, protocol):
     enemy_color = Color.BLACK if current_color is Color.WHITE else Color.WHITE
-    redrawn = []
-    for direction in [(-1, -1), (-1, 0), (0, -1), (1, -1), (-1, 1), (0, 1), (1, 0), (1, 1)]:
-        current_field = (chosen_field[0] + direction[0], chosen_field[1] + direction[1])
-        is_valid = False
-        while check_field_validness(current_field) and board[current_field[0]][current_field[1]] is enemy_color:
-            current_field = (current_field[0] + direction[0], current_field[1] + direction[1])
-            if check_field_validness(current_field) and board[current_field[0]][current_field[1]] is current_color:
-                is_valid = True
-                break
-        if is_valid:
-            current_field = (chosen_field[0] + direction[0], chosen_field[1] + direction[1])
-            while check_field_validness(current_field) and board[current_field[0]][current_field[1]] is enemy_color:
-                board[current_field[0]][current_field[1]] = current_color
-                redrawn.append(current_field)
-                current_field = (current_field[0] + direction[0], current_field[1] + direction[1])
-                if check_field_validness(current_field) and board[current_field[0]][current_field[1]] is current_color:
-                    break
-
-    protocol["details"].append(f"Поля {redrawn} перекрашены из {enemy_color} в {current_color}")
+    own, opp = bitboard.split(*bitboard.from_board(board), current_color)
+    flipped = bitboard.flips(own, opp, bitboard.square(chosen_field))
+    recolor(board, flipped, current_color)
+
+    protocol["details"].append(f"Поля {bitboard.fields(flipped)} перекрашены из {enemy_color} в {current_color}")
+
+
+"""
+Перекрашивает поля, отмеченные в маске flipped, в выбранный цвет
+"""
+
+
+def recolor(board: list[list[Color]], flipped: int, current_color: Color):
+    for i, j in bitboard.fields(flipped):
+        board[i][j] = current_color
 
 
 """
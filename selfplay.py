@@ -0,0 +1,170 @@
+import argparse
+import time
+
+import numpy as np
+
+import batch_eval
+import bitboard
+import dataset
+from color import Color
+
+"""
+Пакетная генерация партий: все партии идут в ногу, за шаг каждая делает один полуход.
+Правила те же, что у rules.available_fields / rules.redraw, пропуски хода - как в game.session:
+партию начинают черные, после двух пропусков подряд она заканчивается
+"""
+
+RANDOM = "random"
+GREEDY = "greedy"
+POLICIES = (RANDOM, GREEDY)
+
+# Отметки в истории ходов: пропуск хода и полуход после конца партии
+PASS = -1
+NO_MOVE = -2
+# Ходов не больше 60, пропусков не больше, чем ходов, плюс два завершающих
+MAX_PLIES = 128
+
+ONE = np.uint64(1)
+
+
+"""
+Выбирает по одному полю из каждой маски legal: случайное или переворачивающее больше всего фишек,
+равные варианты выбираются случайно
+"""
+
+
+def choose(own, opp, legal, policy: str, rng) -> np.ndarray:
+    bits = batch_eval.to_bits(legal)
+    if policy == RANDOM:
+        # у допустимых полей ключ из [1, 2), у остальных из [0, 1)
+        return np.argmax(bits + rng.random(bits.shape), axis=1)
+
+    gains = np.full(bits.shape, -1.0)
+    for square in np.flatnonzero(bits.any(axis=0)):
+        playable = bits[:, square] == 1
+        flipped = batch_eval.flips(own[playable], opp[playable], np.full(int(playable.sum()), ONE << np.uint64(square)))
+        gains[playable, square] = batch_eval.popcount(flipped)
+    return np.argmax(gains + 0.5 * rng.random(bits.shape), axis=1)
+
+
+"""
+Проводит партии от позиций positions ((N, 2) uint64: черные, белые; ходят черные),
+по умолчанию count партий от начальной позиции.
+Возвращает маски фишек в конце партий, число полуходов с пропусками, итог для черных (1, 0, -1),
+при record - историю ходов (N, MAX_PLIES): номер поля, PASS или NO_MOVE,
+при collect - все позиции партий записями набора dataset, партия за партией
+"""
+
+
+def simulate(count: int = None, policy: str = RANDOM, seed=None, positions=None, record: bool = True,
+             collect: bool = False) -> dict:
+    if policy not in POLICIES:
+        raise ValueError(f"Неизвестная стратегия {policy}")
+    if positions is None:
+        positions = np.tile(np.array([bitboard.START_BLACK, bitboard.START_WHITE], dtype=np.uint64), (count, 1))
+    positions = np.asarray(positions, dtype=np.uint64)
+    total = len(positions)
+    rng = np.random.default_rng(seed)
+
+    final = positions.copy()
+    plies = np.zeros(total, dtype=np.int64)
+    history = np.full((total, MAX_PLIES), NO_MOVE, dtype=np.int8) if record else None
+
+    # Состояние еще идущих партий; закончившиеся из массивов удаляются
+    index = np.arange(total)
+    black = positions[:, 0].copy()
+    white = positions[:, 1].copy()
+    white_to_move = np.zeros(total, dtype=bool)
+    stopped = np.zeros(total, dtype=bool)
+    ply = np.zeros(total, dtype=np.int64)
+    # Позиции каждого шага: (номер партии, черные, белые, цвет хода, ход)
+    visited = []
+
+    while index.size:
+        own = np.where(white_to_move, white, black)
+        opp = np.where(white_to_move, black, white)
+        legal = batch_eval.moves(own, opp)
+        passing = legal == 0
+        moving = ~passing
+        if collect:
+            side = np.where(white_to_move, Color.WHITE.value, Color.BLACK.value).astype(np.uint8)
+            visited.append([index, black.copy(), white.copy(), side, np.full(index.size, PASS, dtype=np.int8)])
+
+        if moving.any():
+            own, opp = own[moving], opp[moving]
+            squares = choose(own, opp, legal[moving], policy, rng)
+            move = ONE << squares.astype(np.uint64)
+            flipped = batch_eval.flips(own, opp, move)
+            own, opp = own | flipped | move, opp & ~flipped
+            side = white_to_move[moving]
+            black[moving] = np.where(side, opp, own)
+            white[moving] = np.where(side, own, opp)
+            if record:
+                history[index[moving], ply[moving]] = squares
+            if collect:
+                visited[-1][4][moving] = squares
+        if record:
+            history[index[passing], ply[passing]] = PASS
+
+        ply += 1
+        over = passing & stopped
+        stopped = passing
+        white_to_move = ~white_to_move
+
+        if over.any():
+            finished = index[over]
+            final[finished, 0] = black[over]
+            final[finished, 1] = white[over]
+            plies[finished] = ply[over]
+            playing = ~over
+            index, black, white = index[playing], black[playing], white[playing]
+            white_to_move, stopped, ply = white_to_move[playing], stopped[playing], ply[playing]
+
+    discs = batch_eval.popcount(final[:, 0]) - batch_eval.popcount(final[:, 1])
+    games = {
+        "black": final[:, 0],
+        "white": final[:, 1],
+        "plies": plies,
+        "result": np.sign(discs),
+        "history": history
+    }
+    if collect:
+        games["positions"] = positions_records(visited, discs)
+    return games
+
+
+"""
+Записи набора dataset по позициям шагов visited, сгруппированные по партиям в порядке ходов
+"""
+
+
+def positions_records(visited: list, discs: np.ndarray) -> np.ndarray:
+    game, black, white, side, move = (np.concatenate(column) for column in zip(*visited))
+    order = np.argsort(game, kind="stable")
+    records = np.zeros(order.size, dtype=dataset.record_dtype())
+    records["black"] = black[order]
+    records["white"] = white[order]
+    records["side"] = side[order]
+    records["move"] = move[order]
+    records["diff"] = discs[game[order]]
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пакетная генерация партий")
+    parser.add_argument("--games", type=int, default=10000, help="число партий")
+    parser.add_argument("--policy", choices=POLICIES, default=RANDOM, help="выбор хода")
+    parser.add_argument("--seed", type=int, default=None, help="зерно генератора")
+    parser.add_argument("--dataset-dir", default=None, help="дописать позиции партий в шарды набора")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    games = simulate(args.games, args.policy, args.seed, record=False, collect=args.dataset_dir is not None)
+    elapsed = time.perf_counter() - started
+    if args.dataset_dir is not None:
+        dataset.ShardWriter(args.dataset_dir).write_array(games["positions"])
+        print(f"Позиций записано: {len(games['positions'])}")
+    result = games["result"]
+    print(f"Партий: {args.games} за {elapsed:.2f} с ({args.games / elapsed:.0f} партий/с)")
+    print(f"Победы черных: {int((result == 1).sum())}, ничьи: {int((result == 0).sum())}, "
+          f"победы белых: {int((result == -1).sum())}")
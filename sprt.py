@@ -0,0 +1,124 @@
+import math
+
+"""
+Последовательный тест отношения правдоподобия (SPRT) для матча двух ботов.
+Партии играются парами с одним дебютом и сменой цветов, пара дает 0, ½, 1, 1½ или 2 очка,
+счет пар по этим пяти исходам (пентаномиальный) учитывает, что дебют влияет на обе партии.
+Отношение правдоподобия гипотез H0: сила elo0 и H1: сила elo1 считается в нормальном
+приближении по среднему и дисперсии очков пары
+"""
+
+# Очки за партию в каждом из пяти исходов пары
+PAIR_SCORES = (0.0, 0.25, 0.5, 0.75, 1.0)
+
+# Добавка к счету каждого из пяти исходов: без нее одинаково сыгранные пары дают нулевую
+# дисперсию, и тест не может принять решение
+PRIOR = 0.5
+
+# Квантиль нормального распределения для 95% доверительного интервала
+Z95 = 1.959964
+
+H0 = "H0"
+H1 = "H1"
+
+
+"""
+Ожидаемая доля очков при разнице в силе elo
+"""
+
+
+def expected_score(elo: float) -> float:
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+
+"""
+Разница в силе по доле очков score
+"""
+
+
+def elo_from_score(score: float) -> float:
+    if score <= 0.0:
+        return -math.inf
+    if score >= 1.0:
+        return math.inf
+    return -400.0 * math.log10(1.0 / score - 1.0)
+
+
+"""
+Границы логарифма отношения правдоподобия при ошибках первого и второго рода alpha и beta:
+ниже нижней принимается H0, выше верхней - H1
+"""
+
+
+def bounds(alpha: float, beta: float) -> tuple[float, float]:
+    return math.log(beta / (1.0 - alpha)), math.log((1.0 - beta) / alpha)
+
+
+"""
+Число пар, средние очки за партию и дисперсия очков пары по пентаномиальному счету counts.
+Среднее и дисперсия считаются по счету с добавкой PRIOR, поэтому дисперсия всегда положительна
+"""
+
+
+def moments(counts: list[int]) -> tuple[int, float, float]:
+    pairs = sum(counts)
+    smoothed = [count + PRIOR for count in counts]
+    total = sum(smoothed)
+    mean = sum(count * score for count, score in zip(smoothed, PAIR_SCORES)) / total
+    variance = sum(count * (score - mean) ** 2 for count, score in zip(smoothed, PAIR_SCORES)) / total
+    return pairs, mean, variance
+
+
+"""
+Логарифм отношения правдоподобия H1 к H0
+"""
+
+
+def llr(counts: list[int], elo0: float, elo1: float) -> float:
+    pairs, mean, variance = moments(counts)
+    score0, score1 = expected_score(elo0), expected_score(elo1)
+    return pairs * (score1 - score0) * (2.0 * mean - score0 - score1) / (2.0 * variance)
+
+
+"""
+Оценка разницы в силе и полуширина 95% доверительного интервала
+"""
+
+
+def estimate(counts: list[int]) -> tuple[float, float]:
+    pairs, mean, variance = moments(counts)
+    if pairs == 0:
+        return 0.0, math.inf
+    error = Z95 * math.sqrt(variance / pairs)
+    low, high = elo_from_score(mean - error), elo_from_score(mean + error)
+    return elo_from_score(mean), (high - low) / 2.0
+
+
+"""
+Последовательный тест по мере поступления пар
+"""
+
+
+class Sprt:
+    def __init__(self, elo0: float = 0.0, elo1: float = 5.0, alpha: float = 0.05, beta: float = 0.05):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower, self.upper = bounds(alpha, beta)
+        # Пары с суммой очков 0, ½, 1, 1½, 2
+        self.counts = [0, 0, 0, 0, 0]
+
+    # first, second - очки кандидата в партиях пары (0, ½ или 1)
+    def add_pair(self, first: float, second: float):
+        self.counts[round(2 * (first + second))] += 1
+
+    def llr(self) -> float:
+        return llr(self.counts, self.elo0, self.elo1)
+
+    # Принятая гипотеза (H0 или H1) или None, пока данных не хватает
+    def decision(self):
+        value = self.llr()
+        if value >= self.upper:
+            return H1
+        if value <= self.lower:
+            return H0
+        return None
@@ -0,0 +1,34 @@
+import bitboard
+import poscache
+import rules
+from color import Color
+
+
+def start_board():
+    board = [[Color.EMPTY] * 8 for _ in range(8)]
+    board[3][3] = board[4][4] = Color.WHITE
+    board[3][4] = board[4][3] = Color.BLACK
+    return board
+
+
+def test_available_fields_keeps_search_results(monkeypatch):
+    cache = poscache.PositionCache(bytearray(2 ** 16))
+    monkeypatch.setattr(poscache, "_default", (cache, None))
+    board = start_board()
+    own, opp = bitboard.split(*bitboard.from_board(board), Color.BLACK)
+
+    cache.store(own, opp, value=1.5, best=19, depth=6, tag=7)
+    fields = rules.available_fields(board, Color.BLACK)
+
+    moves, value, best, depth = cache.lookup(own, opp, tag=7)
+    assert bitboard.fields(moves) == fields
+    assert (value, best, depth) == (1.5, 19, 6)
+
+
+def test_store_under_new_tag_drops_old_results():
+    cache = poscache.PositionCache(bytearray(2 ** 16))
+    own, opp = bitboard.START_BLACK, bitboard.START_WHITE
+    cache.store(own, opp, value=1.5, best=19, depth=6, tag=7)
+    cache.store(own, opp, value=-0.5, tag=8)
+    assert cache.lookup(own, opp, tag=8)[1:] == (-0.5, None, 0)
+    assert cache.lookup(own, opp, tag=7)[1:] == (None, None, 0)
@@ -0,0 +1,31 @@
+import math
+
+import sprt
+
+
+def test_one_sided_pairs_are_decisive():
+    test = sprt.Sprt(0.0, 5.0)
+    for _ in range(50):
+        test.add_pair(1.0, 1.0)
+    assert test.decision() == sprt.H1
+
+    test = sprt.Sprt(0.0, 5.0)
+    for _ in range(50):
+        test.add_pair(0.0, 0.0)
+    assert test.decision() == sprt.H0
+
+
+def test_all_draws_accept_equal_strength():
+    assert sprt.llr([0, 0, 5000, 0, 0], 0.0, 5.0) < sprt.bounds(0.05, 0.05)[0]
+
+
+def test_estimate_is_finite_for_one_sided_counts():
+    elo, error = sprt.estimate([0, 0, 0, 0, 5000])
+    assert elo > 0 and math.isfinite(elo)
+    assert not math.isnan(error)
+
+
+def test_first_pair_decides_nothing():
+    test = sprt.Sprt(0.0, 5.0)
+    test.add_pair(1.0, 1.0)
+    assert test.decision() is None
@@ -0,0 +1,341 @@
+from clock import TimeControl, latency_summary
+from color import Color
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from game import session
+import bitboard
+import botworker
+import dataset
+import importlib
+import itertools
+import os
+import pkgutil
+import poscache
+import protocol as events
+import queue
+import random
+import sprt
+
+"""
+Возвращает имена найденных модулей ботов (bot_*)
+"""
+
+
+def discover_bots() -> list[str]:
+    return sorted(owner for finder, owner, ispkg in pkgutil.iter_modules() if owner.startswith('bot_'))
+
+
+"""
+Случайные дебюты: count последовательностей из plies ходов от начальной позиции.
+Число ходов округляется до четного, чтобы партию, как и в session, начинали черные
+"""
+
+
+def make_openings(count: int, plies: int, seed=None) -> list[list[tuple[int, int]]]:
+    plies -= plies % 2
+    if count <= 0 or plies <= 0:
+        return [[]]
+    rng = random.Random(seed)
+    result = []
+    while len(result) < count:
+        black, white = bitboard.START_BLACK, bitboard.START_WHITE
+        color = Color.BLACK
+        opening = []
+        for _ in range(plies):
+            own, opp = bitboard.split(black, white, color)
+            fields = bitboard.fields(bitboard.moves(own, opp))
+            if len(fields) == 0:
+                break
+            field = rng.choice(fields)
+            own, opp = bitboard.play(own, opp, bitboard.square(field))
+            black, white = bitboard.split(own, opp, color)
+            color = Color.WHITE if color is Color.BLACK else Color.BLACK
+            opening.append(field)
+        if len(opening) == plies:
+            result.append(opening)
+    return result
+
+
+"""
+Доска после дебютной последовательности ходов
+"""
+
+
+def opening_board(opening: list[tuple[int, int]]) -> list[list[Color]]:
+    black, white = bitboard.START_BLACK, bitboard.START_WHITE
+    color = Color.BLACK
+    for field in opening:
+        own, opp = bitboard.play(*bitboard.split(black, white, color), bitboard.square(field))
+        black, white = bitboard.split(own, opp, color)
+        color = Color.WHITE if color is Color.BLACK else Color.BLACK
+    return bitboard.to_board(black, white)
+
+
+"""
+Играет одну партию в рабочем процессе. События протокола пишутся в файл JSONL
+своего процесса в каталоге log_dir, позиции партии - в шарды набора в каталоге dataset_dir,
+без каталогов не сохраняются. С isolation (botworker.Limits) боты работают в своих процессах,
+при контроле времени - всегда: брошенный по лимиту вызов бота иначе продолжал бы работать
+в этом процессе и менять состояние бота в следующих партиях.
+Возвращает (номер, первый бот, второй бот, итог для первого бота, разница фишек черные - белые,
+время на ходы первого бота, время на ходы второго бота)
+"""
+
+
+def play_game(task: tuple) -> tuple:
+    index, first_name, second_name, opening, log_dir, time_control, dataset_dir, isolation = task
+    if isolation is None and time_control is not None and time_control.is_limited():
+        isolation = botworker.Limits()
+    first_bot = load_bot(first_name, isolation)
+    second_bot = load_bot(second_name, isolation)
+    board = opening_board(opening)
+    sinks = []
+    if dataset_dir is not None:
+        sinks.append(dataset.PositionSink(dataset.ShardWriter(dataset_dir), board))
+    if log_dir is None:
+        protocol = session(board, first_bot, second_bot, events.TeeSink(*sinks), time_control)
+    else:
+        with open(os.path.join(log_dir, f"games-{os.getpid()}.jsonl"), "a", buffering=1 << 16) as file:
+            protocol = session(board, first_bot, second_bot, events.TeeSink(events.JsonlSink(file, index), *sinks),
+                               time_control)
+    # Бот, не ответивший вовремя или упавший, к следующей партии запускается заново
+    if isolation is not None:
+        first_bot.recover()
+        second_bot.recover()
+    # Брошенный по лимиту вызов бота в этом процессе продолжает работать в своем потоке,
+    # следующие партии бот играет в своем процессе
+    elif "abandoned" in protocol:
+        abandoned.add(protocol["abandoned"])
+    cache = poscache.default()
+    if cache is not None:
+        cache.flush()
+    black_count, white_count = protocol["discs"]
+    first_times, second_times = protocol["think times"]
+    return index, first_name, second_name, protocol["result"], black_count - white_count, first_times, second_times
+
+
+"""
+Настройка рабочего процесса турнира до импорта ботов. Процессы турнира уже заняли ядра, поэтому
+бот ищет ход в одном процессе (REVERSI_WORKERS=1), иначе процессов было бы ядра × REVERSI_WORKERS
+"""
+
+
+def init_worker():
+    os.environ["REVERSI_WORKERS"] = "1"
+
+
+# Процессы ботов рабочего процесса турнира, запускаются при первой партии бота
+hosts = {}
+# Боты, чей вызов в рабочем процессе турнира был брошен по лимиту времени
+abandoned = set()
+
+
+"""
+Модуль бота или, с isolation, процесс бота (botworker.BotProcess) с теми же функциями.
+Бот из abandoned всегда работает в своем процессе
+"""
+
+
+def load_bot(name: str, isolation: botworker.Limits = None):
+    if isolation is None and name in abandoned:
+        isolation = botworker.Limits()
+    if isolation is None:
+        return importlib.import_module(name)
+    if name not in hosts:
+        hosts[name] = botworker.BotProcess(name, isolation)
+    return hosts[name]
+
+
+"""
+Все упорядоченные пары ботов, каждая играет games партий по очереди дебютов.
+Единственный бот играет сам с собой
+"""
+
+
+def schedule(bots: list[str], games: int, openings: list[list[tuple[int, int]]], log_dir=None,
+             time_control: TimeControl = None, dataset_dir=None, isolation: botworker.Limits = None) -> list[tuple]:
+    pairs = list(itertools.permutations(bots, 2)) if len(bots) > 1 else [(bot, bot) for bot in bots]
+    tasks = []
+    for first_name, second_name in pairs:
+        for k in range(games):
+            tasks.append((len(tasks), first_name, second_name, openings[k % len(openings)], log_dir, time_control,
+                          dataset_dir, isolation))
+    return tasks
+
+
+"""
+Сводная таблица: для каждого бота и соперника [побед, ничьих, поражений, разница фишек]
+"""
+
+
+def crosstable(results: list[tuple]) -> dict:
+    table = {}
+    for index, first_name, second_name, result, diff, *_ in results:
+        row = table.setdefault(first_name, {}).setdefault(second_name, [0, 0, 0, 0])
+        row[1 - result] += 1
+        row[3] += diff
+        if first_name != second_name:
+            row = table.setdefault(second_name, {}).setdefault(first_name, [0, 0, 0, 0])
+            row[1 + result] += 1
+            row[3] -= diff
+    return table
+
+
+def format_crosstable(table: dict) -> str:
+    bots = sorted(table)
+    width = max([len(bot) for bot in bots] + [16])
+    lines = [" " * width + "".join(f" | {bot:>{width}}" for bot in bots) + f" | {'Итого':>{width}}"]
+    for bot in bots:
+        cells = []
+        total = [0, 0, 0, 0]
+        for opponent in bots:
+            stats = table[bot].get(opponent)
+            if stats is None:
+                cells.append(f" | {'-':>{width}}")
+                continue
+            total = [a + b for a, b in zip(total, stats)]
+            cells.append(f" | {'{}/{}/{} {:+d}'.format(*stats):>{width}}")
+        cells.append(f" | {'{}/{}/{} {:+d}'.format(*total):>{width}}")
+        lines.append(f"{bot:<{width}}" + "".join(cells))
+    return "\n".join(lines)
+
+
+"""
+Перцентили времени на ход по каждому боту за все партии
+"""
+
+
+def latency_table(results: list[tuple]) -> dict:
+    times = {}
+    for index, first_name, second_name, result, diff, first_times, second_times in results:
+        times.setdefault(first_name, []).extend(first_times)
+        times.setdefault(second_name, []).extend(second_times)
+    return {bot: latency_summary(bot_times) for bot, bot_times in times.items()}
+
+
+def format_latency_table(latencies: dict) -> str:
+    width = max([len(bot) for bot in latencies] + [16])
+    lines = [f"{'':<{width}} | {'ходов':>7} | {'p50, мс':>9} | {'p95, мс':>9} | {'p99, мс':>9} | {'max, мс':>9}"]
+    for bot in sorted(latencies):
+        summary = latencies[bot]
+        lines.append(f"{bot:<{width}} | {summary['moves']:>7}"
+                     + "".join(f" | {1000 * summary[key]:>9.1f}" for key in ("p50", "p95", "p99", "max")))
+    return "\n".join(lines)
+
+
+def format_cache_stats(stats: dict) -> str:
+    return (f"записей {stats['capacity']}, попаданий {stats['hits']}, промахов {stats['misses']}, "
+            f"доля попаданий {100 * stats['hit rate']:.1f}%")
+
+
+"""
+Проводит турнир на пуле процессов по числу ядер, печатая итоги партий по мере их завершения.
+С cache_mb процессы делят кэш позиций (poscache) такого размера в разделяемой памяти,
+с isolation каждый процесс держит ботов в отдельных процессах до конца турнира.
+Возвращает сводную таблицу
+"""
+
+
+def run(bots: list[str], games: int = 1, openings: list[list[tuple[int, int]]] = None, workers: int = None,
+        log_dir: str = None, time_control: TimeControl = None, dataset_dir: str = None,
+        cache_mb: float = None, isolation: botworker.Limits = None) -> dict:
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+    tasks = schedule(bots, games, openings or [[]], log_dir, time_control, dataset_dir, isolation)
+    results = []
+    cache = memory = None
+    if cache_mb:
+        cache, memory = poscache.create_shared(cache_mb)
+        # Рабочие процессы подключаются к кэшу по имени при первом обращении
+        os.environ[poscache.ENV_NAME] = memory.name
+    try:
+        # Рабочие процессы ProcessPoolExecutor, в отличие от multiprocessing.Pool, не демоны
+        # и могут запускать процессы ботов
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=init_worker) as executor:
+            for future in as_completed([executor.submit(play_game, task) for task in tasks]):
+                game_result = future.result()
+                results.append(game_result)
+                index, first_name, second_name, result, diff, *_ = game_result
+                score = {1: "1-0", 0: "½-½", -1: "0-1"}[result]
+                print(f"[{len(results)}/{len(tasks)}] {first_name} vs {second_name}: {score} ({diff:+d})", flush=True)
+        if cache is not None:
+            stats = cache.stats()
+    finally:
+        if memory is not None:
+            del os.environ[poscache.ENV_NAME]
+            del cache
+            memory.close()
+            memory.unlink()
+    table = crosstable(results)
+    print("Победы/ничьи/поражения и разница фишек")
+    print(format_crosstable(table))
+    print("Время на ход")
+    print(format_latency_table(latency_table(results)))
+    if memory is not None:
+        print("Кэш позиций")
+        print(format_cache_stats(stats))
+    return table
+
+
+"""
+Матч кандидата против базового бота с последовательным тестом (sprt.Sprt): дебюты идут
+по очереди, каждый играется парой партий со сменой цветов. После каждой пары проверяется
+тест, матч заканчивается, когда принята одна из гипотез или сыграно max_games партий.
+Возвращает итог: число партий, пентаномиальный счет, Elo кандидата с полушириной
+95% интервала, логарифм отношения правдоподобия и причину остановки
+"""
+
+
+def match(candidate: str, baseline: str, test: sprt.Sprt, openings: list[list[tuple[int, int]]] = None,
+          max_games: int = 20000, workers: int = None, log_dir: str = None, time_control: TimeControl = None,
+          dataset_dir: str = None, isolation: botworker.Limits = None) -> dict:
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+    openings = openings or [[]]
+    workers = workers or os.cpu_count()
+    max_pairs = max(1, max_games // 2)
+    finished = queue.Queue()
+    # Очки кандидата в уже сыгранных партиях незавершенных пар
+    scores = {}
+    reason = "лимит партий"
+
+    def submit(pair: int):
+        opening = openings[pair % len(openings)]
+        for index, first_name, second_name in ((2 * pair, candidate, baseline), (2 * pair + 1, baseline, candidate)):
+            task = (index, first_name, second_name, opening, log_dir, time_control, dataset_dir, isolation)
+            executor.submit(play_game, task).add_done_callback(finished.put)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        # Пар в работе вдвое больше, чем процессов, чтобы пул не простаивал
+        submitted = min(max_pairs, 2 * workers)
+        for pair in range(submitted):
+            submit(pair)
+        done = 0
+        while done < max_pairs:
+            index, first_name, second_name, result, *_ = finished.get().result()
+            score = (1 + result) / 2 if first_name == candidate else (1 - result) / 2
+            pair = index // 2
+            if pair not in scores:
+                scores[pair] = score
+                continue
+            test.add_pair(scores.pop(pair), score)
+            done += 1
+            lower, upper = test.lower, test.upper
+            print(f"[{done} пар] LLR {test.llr():+.2f} ({lower:+.2f}, {upper:+.2f}), "
+                  f"счет пар {test.counts}", flush=True)
+            decision = test.decision()
+            if decision is not None:
+                reason = f"принята {decision}"
+                break
+            if submitted < max_pairs:
+                submit(submitted)
+                submitted += 1
+        # Начатые партии доигрываются, остальные отменяются
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    elo, error = sprt.estimate(test.counts)
+    summary = {"games": 2 * sum(test.counts), "pentanomial": list(test.counts), "elo": elo, "error": error,
+               "llr": test.llr(), "reason": reason}
+    print(f"{candidate} против {baseline}: Elo {elo:+.1f} ± {error:.1f} (95%), партий {summary['games']}, "
+          f"LLR {summary['llr']:+.2f}, H0: {test.elo0:+g} Elo, H1: {test.elo1:+g} Elo")
+    print(f"Остановка: {reason}")
+    return summary
@@ -0,0 +1,147 @@
+import argparse
+import time
+
+import numpy as np
+
+import batch_eval
+import dataset
+import weights
+from color import Color
+
+# ===================================================================================
+# Weight tuner
+# ===================================================================================
+# Fits the game_heuristic weights to game outcomes over the positions of a dataset
+# (dataset.py shards, written by the tournament or by selfplay.py). Every position is
+# labelled +1/0/-1 by the final result for the side to move. Features come from
+# batch_eval.features in chunks, so a shard is never loaded whole:
+#   lstsq    - least squares, one pass accumulating the normal equations
+#   logistic - batched gradient descent on the win probability, features kept in RAM
+# With --squares the d term is replaced by one feature per square class of the octant
+# below, and the fitted values become the piece-square table V.
+
+OCTANT = [(0, 0), (0, 1), (0, 2), (0, 3), (1, 1), (1, 2), (1, 3), (2, 2), (2, 3), (3, 3)]
+
+
+def square_classes():
+    """Mask of every OCTANT square together with its images under the 8 board symmetries."""
+    masks = []
+    for i, j in OCTANT:
+        mask = 0
+        for x, y in [(i, j), (j, i)]:
+            for a, b in [(x, y), (7 - x, y), (x, 7 - y), (7 - x, 7 - y)]:
+                mask |= 1 << (a * 8 + b)
+        masks.append(np.uint64(mask))
+    return masks
+
+
+CLASS_MASKS = square_classes()
+
+
+def batches(directory, size):
+    """(positions, outcomes) chunks of all shards: (n, 2) own/opponent masks and +1/0/-1 results."""
+    for shard in dataset.open_dataset(directory):
+        for start in range(0, len(shard), size):
+            part = shard[start:start + size]
+            white_to_move = part["side"] == Color.WHITE.value
+            black, white = np.asarray(part["black"]), np.asarray(part["white"])
+            positions = np.stack([np.where(white_to_move, white, black), np.where(white_to_move, black, white)], axis=1)
+            outcomes = np.sign(part["diff"].astype(np.float64)) * np.where(white_to_move, -1.0, 1.0)
+            yield positions, outcomes
+
+
+def design(positions, fix_frontier, fix_corner_closeness, squares):
+    """Feature matrix: p, c, l, m, f, d, or p, c, l, m, f and the square classes."""
+    x = batch_eval.features(positions, fix_frontier, fix_corner_closeness)
+    if not squares:
+        return x
+    own, opp = batch_eval.to_masks(positions)
+    classes = [batch_eval.popcount(own & mask) - batch_eval.popcount(opp & mask) for mask in CLASS_MASKS]
+    return np.concatenate([x[:, :5], np.stack(classes, axis=1)], axis=1)
+
+
+def fit_lstsq(chunks):
+    xtx = xty = None
+    count = 0
+    for x, y in chunks:
+        if xtx is None:
+            xtx = np.zeros((x.shape[1], x.shape[1]))
+            xty = np.zeros(x.shape[1])
+        xtx += x.T @ x
+        xty += x.T @ y
+        count += len(y)
+    # features that never vary (f without the frontier fix) make the system singular
+    return np.linalg.lstsq(xtx, xty, rcond=None)[0], count
+
+
+def fit_logistic(chunks, epochs, rate):
+    xs, ys = zip(*((x.astype(np.float32), y.astype(np.float32)) for x, y in chunks))
+    x, y = np.concatenate(xs), (np.concatenate(ys) + 1) / 2
+    scale = x.std(axis=0)
+    scale[scale == 0] = 1
+    x /= scale
+    w = np.zeros(x.shape[1], dtype=np.float32)
+    for _ in range(epochs):
+        predicted = 1 / (1 + np.exp(-(x @ w)))
+        w -= rate * (x.T @ (predicted - y)) / len(y)
+    return w.astype(np.float64) / scale, len(y)
+
+
+def agreement(directory, size, coefficients, fix_frontier, fix_corner_closeness, squares):
+    """Share of decided games whose result has the sign of the score."""
+    hits = total = 0
+    for positions, outcomes in batches(directory, size):
+        scores = design(positions, fix_frontier, fix_corner_closeness, squares) @ coefficients
+        decided = outcomes != 0
+        hits += int((np.sign(scores[decided]) == outcomes[decided]).sum())
+        total += int(decided.sum())
+    return hits / total if total else 0.0
+
+
+def to_weights(coefficients, fix_frontier, fix_corner_closeness, squares):
+    result = dict(batch_eval.WEIGHTS)
+    result["fix frontier"] = fix_frontier
+    result["fix corner closeness"] = fix_corner_closeness
+    if squares:
+        result.update(zip(weights.TERMS[:5], coefficients[:5].tolist()))
+        result["d"] = 1.0
+        table = [[0.0] * 8 for _ in range(8)]
+        for value, mask in zip(coefficients[5:].tolist(), CLASS_MASKS):
+            for square in range(64):
+                if int(mask) >> square & 1:
+                    table[square // 8][square % 8] = value
+        result["V"] = table
+    else:
+        result.update(zip(weights.TERMS, coefficients.tolist()))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fits the game_heuristic weights to game outcomes")
+    parser.add_argument("dataset", help="directory with dataset shards")
+    parser.add_argument("--output", default=weights.PATH, help="weights file read by bot_canary")
+    parser.add_argument("--method", choices=("lstsq", "logistic"), default="lstsq")
+    parser.add_argument("--squares", action="store_true", help="fit the piece-square table as well")
+    parser.add_argument("--fix-frontier", action="store_true")
+    parser.add_argument("--fix-corner-closeness", action="store_true")
+    parser.add_argument("--chunk", type=int, default=1 << 20, help="positions per feature batch")
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=1.0)
+    args = parser.parse_args()
+    options = (args.fix_frontier, args.fix_corner_closeness, args.squares)
+
+    started = time.perf_counter()
+    chunks = ((design(positions, *options), outcomes) for positions, outcomes in batches(args.dataset, args.chunk))
+    if args.method == "lstsq":
+        coefficients, count = fit_lstsq(chunks)
+    else:
+        coefficients, count = fit_logistic(chunks, args.epochs, args.rate)
+    elapsed = time.perf_counter() - started
+    print(f"{count} positions fitted in {elapsed:.1f} s ({count / elapsed:.0f} positions/s)")
+
+    current = np.array(batch_eval.TERM_WEIGHTS, dtype=np.float64)
+    current_options = (batch_eval.WEIGHTS["fix frontier"], batch_eval.WEIGHTS["fix corner closeness"], False)
+    print(f"results predicted by the score sign: current {agreement(args.dataset, args.chunk, current, *current_options):.3f}, "
+          f"tuned {agreement(args.dataset, args.chunk, coefficients, *options):.3f}")
+    weights.save(args.output, to_weights(coefficients, *options))
+    print(f"weights written to {args.output}")
@@ -0,0 +1,51 @@
+import json
+import os
+
+# ===================================================================================
+# game_heuristic weights
+# ===================================================================================
+# The weights of the six terms (p - discs, c - corners, l - corner closeness,
+# m - mobility, f - frontier, d - piece-square sum) and the piece-square table V.
+# tune.py writes them as JSON; bot_canary and batch_eval read the same file at import,
+# and without it keep the original hand-picked values.
+TERMS = ("p", "c", "l", "m", "f", "d")
+
+LEGACY = {
+    "p": 10,
+    "c": 801.724,
+    "l": 382.026,
+    "m": 78.922,
+    "f": 74.396,
+    "d": 10,
+    "V": [
+        [20, -3, 11,  8,  8, 11, -3, 20],
+        [-3, -7, -4,  1,  1, -4, -7, -3],
+        [11, -4,  2,  2,  2,  2, -4, 11],
+        [8,   1,  2, -3, -3,  2,  1,  8],
+        [8,   1,  2, -3, -3,  2,  1,  8],
+        [11, -4,  2,  2,  2,  2, -4, 11],
+        [-3, -7, -4,  1,  1, -4, -7, -3],
+        [20, -3, 11,  8,  8, 11, -3, 20]
+    ],
+    # the weights were fitted with these game_heuristic fixes turned on
+    "fix frontier": False,
+    "fix corner closeness": False,
+}
+
+PATH = os.environ.get("REVERSI_WEIGHTS",
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights.json"))
+
+
+# the weights in path, missing keys and a missing file fall back to LEGACY
+def load(path=PATH):
+    result = dict(LEGACY)
+    if os.path.exists(path):
+        with open(path) as file:
+            result.update(json.load(file))
+    return result
+
+
+def save(path, weights):
+    with open(path, "w") as file:
+        json.dump(weights, file, indent=2)
+        file.write("\n")